@@ -2,8 +2,307 @@ import streamlit as st
 import pandas as pd
 import os
 import datetime
+import threading
 import altair as alt
-import time
+from collections import OrderedDict
+import ticket_store
+import archive
+import metrics
+
+HOURLY_WINDOW_HOURS = 48
+URGENCY_DOMAIN = ["Low", "Medium", "High", "Critical"]
+URGENCY_COLORS = ["#238636", "#d29922", "#f85149", "#da3633"]
+
+def summarize(store):
+    # Headline metrics and chart counts from the store's rollup counters: the
+    # cost depends on the number of distinct groups, not on the number of tickets
+    # (also timed by benchmark.py)
+    by_status = {r["status"]: r["count"] for r in store.rollup(["status"])}
+    by_urgency = pd.DataFrame(store.rollup(["urgency"]), columns=["urgency", "count"])
+    by_department = pd.DataFrame(store.rollup(["department"]), columns=["department", "count"])
+    since = (datetime.datetime.now() - datetime.timedelta(hours=HOURLY_WINDOW_HOURS - 1)).strftime("%Y-%m-%d %H")
+    hourly = pd.DataFrame(store.rollup(["hour", "urgency"], since_hour=since), columns=["hour", "urgency", "count"])
+    hourly["hour"] = pd.to_datetime(hourly["hour"] + ":00", errors="coerce")
+    return {
+        "total": sum(by_status.values()),
+        "critical": int(by_urgency.loc[by_urgency["urgency"] == "Critical", "count"].sum()),
+        "open": by_status.get("Open", 0),
+        "resolved": by_status.get("Resolved", 0),
+        "by_department": by_department.sort_values("count", ascending=False),
+        "by_urgency": by_urgency,
+        "hourly": hourly.dropna(subset=["hour"]),
+    }
+
+PAGE_SIZES = [25, 50, 100, 250]
+STATUSES = ["Open", "In Progress", "Resolved"]
+DB_DEFAULT_COLUMNS = ticket_store.VIEW_COLUMNS["database"]
+
+# ==========================================
+# LIVE REFRESH
+# ==========================================
+# The metrics row, queue and workspace are fragments that rerun on their own
+# every DASHBOARD_REFRESH_SECONDS (default 1; 0 turns polling off). Each
+# rerun reads the store's change-feed version, and a store query runs only
+# when that version moved. Results are shared by every session in the
+# process, so a quiet queue costs one version read per agent per poll, and
+# nothing re-runs the whole script.
+DEFAULT_REFRESH_SECONDS = 1.0
+LIVE_CACHE_SIZE = 256
+
+_live_cache = OrderedDict()
+_live_lock = threading.Lock()
+
+def live(source, key, compute):
+    version = source.version()
+    with _live_lock:
+        hit = _live_cache.get(key)
+        if hit is not None and hit[0] == version:
+            _live_cache.move_to_end(key)
+            return hit[1]
+    # Tagged with the version read before computing, so a change that lands
+    # meanwhile is picked up by the next poll
+    value = compute()
+    metrics.inc("dashboard_live_recomputes_total")
+    with _live_lock:
+        _live_cache[key] = (version, value)
+        _live_cache.move_to_end(key)
+        while len(_live_cache) > LIVE_CACHE_SIZE: _live_cache.popitem(last=False)
+    return value
+
+def _freeze(filters):
+    return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in (filters or {}).items()))
+
+def live_summary(store):
+    # The hour is part of the key so the 48h chart window still moves on a quiet store
+    return live(store, ("summary", datetime.datetime.now().strftime("%Y-%m-%d %H")), lambda: summarize(store))
+
+def refresh_interval():
+    return float(os.getenv("DASHBOARD_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS)) or None
+
+# Actions run as button callbacks, before their panel redraws, so the panel
+# shows the new state without a sleep or a rerun. Their feedback is queued
+# here and shown at the top of the panel.
+def flash(panel, kind, *args, **kwargs):
+    st.session_state.setdefault(f"{panel}_flash", []).append((kind, args, kwargs))
+
+def show_flash(panel):
+    for kind, args, kwargs in st.session_state.pop(f"{panel}_flash", []):
+        getattr(st, kind)(*args, **kwargs)
+
+def paged_rows(store, key, filters, columns, sort_by=None, descending=False, table=True):
+    # Server-side paging: only the visible page (and only `columns`) leaves the store
+    total = live(store, (key, "count", _freeze(filters)), lambda: store.count_matching(filters))
+    if total == 0: return pd.DataFrame(columns=columns), 0
+    c_size, c_page, c_info = st.columns([1, 1, 2])
+    page_size = c_size.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_size")
+    pages = max(1, -(-total // page_size))
+    if st.session_state.get(f"{key}_page", 1) > pages: st.session_state[f"{key}_page"] = pages
+    page = c_page.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    offset = (page - 1) * page_size
+
+    def fetch():
+        with metrics.timed("dashboard_page"):
+            return store.query_page(columns, filters, sort_by, descending, offset, page_size)
+    rows = live(store, (key, "page", _freeze(filters), tuple(columns), sort_by, descending, offset, page_size), fetch)
+    c_info.caption(f"Rows {offset + 1:,}–{offset + len(rows):,} of {total:,}")
+    if table: st.dataframe(rows, use_container_width=True, hide_index=True)
+    return rows, total
+
+
+# --- LIVE PANELS (fragments) ---
+def _waiting_panel(store):
+    # Full rerun once, when the first ticket lands, to build the tabs
+    if live_summary(store)["total"]: st.rerun()
+    st.info("Waiting for tickets...")
+
+def _metrics_panel(store):
+    summary = live_summary(store)
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Total Tickets", summary["total"])
+    m2.metric("Critical Alerts", summary["critical"], delta_color="inverse")
+    m3.metric("Pending Queue", summary["open"])
+    m4.metric("Resolved", summary["resolved"])
+
+def _claim_ticket(store):
+    ticket_to_claim = st.session_state.get("claim_select")
+    if store.transition(ticket_to_claim, 'Open', 'In Progress'):
+        flash("queue", "toast", f"Ticket {ticket_to_claim} Locked!", icon="🔒")
+    else:
+        flash("queue", "toast", f"Ticket {ticket_to_claim} was already claimed by another agent.", icon="⚠️")
+
+def _resolve_ticket(store):
+    ticket_action_id = st.session_state.get("work_select")
+    if store.transition(ticket_action_id, 'In Progress', 'Resolved'):
+        flash("work", "balloons")
+        flash("work", "success", f"Ticket {ticket_action_id} Closed!")
+    else:
+        flash("work", "warning", f"Ticket {ticket_action_id} was changed by another agent.")
+
+def _transfer_ticket(store):
+    ticket_action_id, new_dept = st.session_state.get("work_select"), st.session_state.get("transfer_dept")
+    if store.transition(ticket_action_id, 'In Progress', 'Open', department=new_dept):
+        flash("work", "info", f"Transferred to {new_dept}.")
+    else:
+        flash("work", "warning", f"Ticket {ticket_action_id} was changed by another agent.")
+
+def _queue_panel(store):
+    show_flash("queue")
+    summary = live_summary(store)
+    st.markdown("#### 🚨 Unassigned Tickets")
+    open_tickets, open_count = paged_rows(store, "queue", {"status": "Open"}, ticket_store.VIEW_COLUMNS["queue"])
+
+    if open_count:
+
+        c1, c2 = st.columns([3, 1])
+        with c1:
+            st.selectbox("Select Ticket to Claim:", open_tickets['ticket_id'].unique(), key="claim_select")
+        with c2:
+            st.write("")
+            st.write("")
+            st.button("🙋‍♂️ Claim Ticket", use_container_width=True, type="primary", on_click=_claim_ticket, args=(store,))
+    else:
+        st.success("🎉 Queue is empty!")
+
+    # ANALYTICS CHARTS
+    st.markdown("---")
+    st.subheader("📊 Live Analytics")
+    g1, g2 = st.columns(2)
+
+    with g1:
+        st.caption("Incidents by Department")
+        chart1 = alt.Chart(summary["by_department"]).mark_bar().encode(
+            x=alt.X('department', title=None),
+            y=alt.Y('count', axis=alt.Axis(tickMinStep=1)),
+            color=alt.value('#58a6ff')
+        ).interactive()
+        st.altair_chart(chart1, use_container_width=True)
+
+    with g2:
+        st.caption("Incidents by Urgency")
+        domain = URGENCY_DOMAIN
+        range_ = URGENCY_COLORS
+        chart2 = alt.Chart(summary["by_urgency"]).mark_bar().encode(
+            x=alt.X('urgency', sort=domain, title=None),
+            y=alt.Y('count', axis=alt.Axis(tickMinStep=1)),
+            color=alt.Color('urgency', scale=alt.Scale(domain=domain, range=range_), legend=None)
+        ).interactive()
+        st.altair_chart(chart2, use_container_width=True)
+
+    st.caption(f"Tickets per Hour by Urgency (last {HOURLY_WINDOW_HOURS}h)")
+    if not summary["hourly"].empty:
+        chart_hourly = alt.Chart(summary["hourly"]).mark_bar().encode(
+            x=alt.X('hour:T', title=None),
+            y=alt.Y('sum(count):Q', title='tickets', axis=alt.Axis(tickMinStep=1)),
+            color=alt.Color('urgency', scale=alt.Scale(domain=URGENCY_DOMAIN, range=URGENCY_COLORS))
+        ).interactive()
+        st.altair_chart(chart_hourly, use_container_width=True)
+    else:
+        st.info(f"No tickets in the last {HOURLY_WINDOW_HOURS} hours.")
+
+def _workspace_panel(store):
+    show_flash("work")
+    st.markdown("#### 🔨 My Active Tickets")
+    my_tickets, my_count = paged_rows(store, "work", {"status": "In Progress"}, ticket_store.VIEW_COLUMNS["workspace"])
+
+    if my_count:
+
+        st.markdown("---")
+        st.selectbox("Select Active Ticket:", my_tickets['ticket_id'].unique(), key="work_select")
+
+        col_a, col_b = st.columns(2)
+
+        # RESOLVE
+        with col_a:
+            st.markdown("""<div class="action-box">✅ <b>Resolution</b></div>""", unsafe_allow_html=True)
+            st.button("Mark as Resolved", use_container_width=True, on_click=_resolve_ticket, args=(store,))
+
+        # TRANSFER
+        with col_b:
+            st.markdown("""<div class="action-box">⇄ <b>Transfer Department</b></div>""", unsafe_allow_html=True)
+            st.selectbox("Move to:", ["Hardware", "Software", "Network", "Access"], label_visibility="collapsed", key="transfer_dept")
+            st.button("Transfer Ticket", on_click=_transfer_ticket, args=(store,))
+
+    else:
+        st.info("No active tickets. Claim one from the Queue!")
+
+def _history_panel(store, departments):
+    st.markdown("#### 🗄️ Resolution Archives")
+    # Recently resolved tickets from the store, older ones from the Parquet
+    # archive (archive.py); only the current page of ids/summaries is loaded
+    history = archive.ResolvedHistory(store, archive.get_archive())
+    h1, h2 = st.columns([2, 1.4])
+    history_filters = {"department": h1.multiselect("Department", departments, key="history_department")}
+    history_dates = h2.date_input("Date range", value=(), key="history_dates")
+    if len(history_dates) >= 1: history_filters["since"] = history_dates[0].strftime("%Y-%m-%d")
+    if len(history_dates) == 2: history_filters["until"] = (history_dates[1] + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    resolved_tickets, resolved_count = paged_rows(history, "history", history_filters, ticket_store.VIEW_COLUMNS["history"],
+                                                  sort_by="timestamp", descending=True, table=False)
+
+    if resolved_count:
+        col_sel, col_view = st.columns([1, 2])
+        summaries = dict(zip(resolved_tickets['ticket_id'], resolved_tickets['summary']))
+        timestamps = dict(zip(resolved_tickets['ticket_id'], resolved_tickets['timestamp']))
+
+        with col_sel:
+            selected_resolved = st.selectbox(
+                "Select Resolved Ticket:",
+                list(summaries),
+                format_func=lambda x: f"{x} - {summaries[x]}"
+            )
+
+        with col_view:
+            row = history.get_ticket(selected_resolved, ticket_store.VIEW_COLUMNS["history_card"], timestamps.get(selected_resolved)) if selected_resolved else None
+            if row:
+
+                st.markdown(f"""
+                <div class="metric-card">
+                    <div style="display:flex; justify-content:space-between; align-items:center;">
+                        <h3 style="color: #2ea043; margin:0;">✔ {row['ticket_id']}</h3>
+                        <span style="background:#2ea043; color:black; padding:2px 8px; border-radius:4px; font-weight:bold; font-size:0.8em;">RESOLVED</span>
+                    </div>
+                    <p style="color:#8b949e; font-size:0.9em; margin-top:5px;">📅 {row['timestamp']}</p>
+                    
+                    <hr style="border-color: #30363d;">
+                    
+                    <p style="color: #58a6ff; font-weight:bold; margin-bottom:0;">ISSUE SUMMARY</p>
+                    <p style="margin-top:0;">{row['summary']}</p>
+                    
+                    <p style="color: #58a6ff; font-weight:bold; margin-bottom:0;">DEPARTMENT</p>
+                    <p style="margin-top:0;">{row['department']}</p>
+                    
+                    <p style="color: #58a6ff; font-weight:bold; margin-bottom:0;">AI DIAGNOSIS (RCA)</p>
+                    <p style="margin-top:0;">{row['rca_hypothesis']}</p>
+                    
+                    <div style="background-color: #0d1117; padding: 10px; border-left: 3px solid #2ea043; border-radius: 4px; margin-top:10px;">
+                        <p style="color: #8b949e; font-size: 0.8em; margin:0;">RESOLUTION / RESPONSE SENT:</p>
+                        <p style="margin:5px 0 0 0; font-style:italic;">"{row['response']}"</p>
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+    else:
+        st.info("No resolved tickets match these filters." if any(history_filters.values()) else "No tickets have been resolved yet.")
+
+def _database_panel(store, departments):
+    # Filters, sort and paging run in the store; the browser only gets the visible page
+    f1, f2, f3, f4, f5 = st.columns([1, 1, 1, 1, 1.4])
+    db_filters = {
+        "status": f1.multiselect("Status", STATUSES, key="db_status"),
+        "urgency": f2.multiselect("Urgency", URGENCY_DOMAIN, key="db_urgency"),
+        "department": f3.multiselect("Department", departments, key="db_department"),
+        "channel": f4.multiselect("Channel", [r["channel"] for r in store.rollup(["channel"])], key="db_channel"),
+    }
+    date_range = f5.date_input("Date range", value=(), key="db_dates")
+    if len(date_range) >= 1: db_filters["since"] = date_range[0].strftime("%Y-%m-%d")
+    if len(date_range) == 2: db_filters["until"] = (date_range[1] + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+
+    c_cols, c_sort, c_dir = st.columns([3, 1, 1])
+    db_columns = c_cols.multiselect("Columns", ticket_store.COLUMNS, default=DB_DEFAULT_COLUMNS, key="db_columns") or DB_DEFAULT_COLUMNS
+    sort_by = c_sort.selectbox("Sort by", ticket_store.COLUMNS, index=ticket_store.COLUMNS.index("timestamp"), key="db_sort")
+    descending = c_dir.toggle("Newest / Z→A first", value=True, key="db_desc")
+
+    _, matching = paged_rows(store, "db", db_filters, db_columns, sort_by=sort_by, descending=descending)
+    if not matching: st.info("No tickets match these filters.")
+
 
 def render_admin_dashboard():
     # --- ENTERPRISE STYLING ---
@@ -27,178 +326,77 @@ def render_admin_dashboard():
     """, unsafe_allow_html=True)
 
     st.title("🛡️ Agent Action Terminal")
-    
+
     # LOAD DATA
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(current_dir, 'ticket_db.csv')
-    
-    if not os.path.exists(file_path):
-        st.info("Waiting for tickets...")
-        return
+    with metrics.timed("dashboard_prep"):
+        store = ticket_store.get_store()
+        summary = live_summary(store)
+    refresh = refresh_interval()
 
-    df = pd.read_csv(file_path)
+    if summary["total"] == 0:
+        st.fragment(_waiting_panel, run_every=refresh)(store)
+        return
 
     # --- METRICS ---
-    total = len(df)
-    critical = len(df[df['urgency'] == 'Critical'])
-    open_t = len(df[df['status'] == 'Open'])
-    solved = len(df[df['status'] == 'Resolved'])
+    st.fragment(_metrics_panel, run_every=refresh)(store)
 
-    m1, m2, m3, m4 = st.columns(4)
-    m1.metric("Total Tickets", total)
-    m2.metric("Critical Alerts", critical, delta_color="inverse")
-    m3.metric("Pending Queue", open_t)
-    m4.metric("Resolved", solved)
-    
     st.divider()
 
     # =========================================================
     # TABS (Updated with "Resolved History")
     # =========================================================
-    
-    tab_queue, tab_work, tab_history, tab_db = st.tabs(["📥 New Queue", "🛠️ My Workspace", "✅ Resolved History", "💾 Database"])
 
-    # --- TAB 1: QUEUE + ANALYTICS ---
+    tab_queue, tab_work, tab_history, tab_db, tab_perf = st.tabs(["📥 New Queue", "🛠️ My Workspace", "✅ Resolved History", "💾 Database", "⏱ Performance"])
+    departments = [r["department"] for r in summary["by_department"].to_dict("records")]
+
+    # --- TAB 1: QUEUE + ANALYTICS (live) ---
     with tab_queue:
-        st.markdown("#### 🚨 Unassigned Tickets")
-        open_tickets = df[df['status'] == 'Open']
-        
-        if not open_tickets.empty:
-            st.dataframe(open_tickets[['ticket_id', 'urgency', 'department', 'summary', 'timestamp']], use_container_width=True, hide_index=True)
-            
-            c1, c2 = st.columns([3, 1])
-            with c1:
-                ticket_to_claim = st.selectbox("Select Ticket to Claim:", open_tickets['ticket_id'].unique(), key="claim_select")
-            with c2:
-                st.write("")
-                st.write("")
-                if st.button("🙋‍♂️ Claim Ticket", use_container_width=True, type="primary"):
-                    df.loc[df['ticket_id'] == ticket_to_claim, 'status'] = 'In Progress'
-                    df.to_csv(file_path, index=False)
-                    st.toast(f"Ticket {ticket_to_claim} Locked!", icon="🔒")
-                    time.sleep(1)
-                    st.rerun()
-        else:
-            st.success("🎉 Queue is empty!")
+        st.fragment(_queue_panel, run_every=refresh)(store)
 
-        # ANALYTICS CHARTS
-        st.markdown("---")
-        st.subheader("📊 Live Analytics")
-        g1, g2 = st.columns(2)
-        
-        with g1:
-            st.caption("Incidents by Department")
-            if not df.empty:
-                dept_counts = df['department'].value_counts().reset_index()
-                dept_counts.columns = ['department', 'count']
-                chart1 = alt.Chart(dept_counts).mark_bar().encode(
-                    x=alt.X('department', title=None),
-                    y=alt.Y('count', axis=alt.Axis(tickMinStep=1)),
-                    color=alt.value('#58a6ff')
-                ).interactive()
-                st.altair_chart(chart1, use_container_width=True)
-            
-        with g2:
-            st.caption("Incidents by Urgency")
-            if not df.empty:
-                urg_counts = df['urgency'].value_counts().reset_index()
-                urg_counts.columns = ['urgency', 'count']
-                domain = ["Low", "Medium", "High", "Critical"]
-                range_ = ["#238636", "#d29922", "#f85149", "#da3633"] 
-                chart2 = alt.Chart(urg_counts).mark_bar().encode(
-                    x=alt.X('urgency', sort=domain, title=None),
-                    y=alt.Y('count', axis=alt.Axis(tickMinStep=1)),
-                    color=alt.Color('urgency', scale=alt.Scale(domain=domain, range=range_), legend=None)
-                ).interactive()
-                st.altair_chart(chart2, use_container_width=True)
-
-
-    # --- TAB 2: WORKSPACE ---
+    # --- TAB 2: WORKSPACE (live) ---
     with tab_work:
-        st.markdown("#### 🔨 My Active Tickets")
-        my_tickets = df[df['status'] == 'In Progress']
-        
-        if not my_tickets.empty:
-            st.dataframe(my_tickets[['ticket_id', 'department', 'summary', 'rca_hypothesis']], use_container_width=True, hide_index=True)
-            
-            st.markdown("---")
-            ticket_action_id = st.selectbox("Select Active Ticket:", my_tickets['ticket_id'].unique(), key="work_select")
-            
-            col_a, col_b = st.columns(2)
-            
-            # RESOLVE
-            with col_a:
-                st.markdown("""<div class="action-box">✅ <b>Resolution</b></div>""", unsafe_allow_html=True)
-                if st.button("Mark as Resolved", use_container_width=True):
-                    df.loc[df['ticket_id'] == ticket_action_id, 'status'] = 'Resolved'
-                    df.to_csv(file_path, index=False)
-                    st.balloons()
-                    st.success(f"Ticket {ticket_action_id} Closed!")
-                    time.sleep(1.5)
-                    st.rerun()
-
-            # TRANSFER
-            with col_b:
-                st.markdown("""<div class="action-box">⇄ <b>Transfer Department</b></div>""", unsafe_allow_html=True)
-                new_dept = st.selectbox("Move to:", ["Hardware", "Software", "Network", "Access"], label_visibility="collapsed")
-                if st.button("Transfer Ticket"):
-                    df.loc[df['ticket_id'] == ticket_action_id, 'department'] = new_dept
-                    df.loc[df['ticket_id'] == ticket_action_id, 'status'] = 'Open' 
-                    df.to_csv(file_path, index=False)
-                    st.info(f"Transferred to {new_dept}.")
-                    time.sleep(1.5)
-                    st.rerun()
-
-        else:
-            st.info("No active tickets. Claim one from the Queue!")
+        st.fragment(_workspace_panel, run_every=refresh)(store)
 
-    # --- TAB 3: RESOLVED HISTORY (NEW FEATURE) ---
+    # --- TAB 3: RESOLVED HISTORY ---
+    # Fragments without a timer: their widgets rerun only the tab
     with tab_history:
-        st.markdown("#### 🗄️ Resolution Archives")
-        resolved_tickets = df[df['status'] == 'Resolved']
-
-        if not resolved_tickets.empty:
-            col_sel, col_view = st.columns([1, 2])
-            
-            with col_sel:
-                selected_resolved = st.selectbox(
-                    "Select Resolved Ticket:",
-                    resolved_tickets['ticket_id'].unique(),
-                    format_func=lambda x: f"{x} - {resolved_tickets[resolved_tickets['ticket_id']==x]['summary'].values[0]}"
-                )
-            
-            with col_view:
-                if selected_resolved:
-                    row = resolved_tickets[resolved_tickets['ticket_id'] == selected_resolved].iloc[0]
-                    
-                    st.markdown(f"""
-                    <div class="metric-card">
-                        <div style="display:flex; justify-content:space-between; align-items:center;">
-                            <h3 style="color: #2ea043; margin:0;">✔ {row['ticket_id']}</h3>
-                            <span style="background:#2ea043; color:black; padding:2px 8px; border-radius:4px; font-weight:bold; font-size:0.8em;">RESOLVED</span>
-                        </div>
-                        <p style="color:#8b949e; font-size:0.9em; margin-top:5px;">📅 {row['timestamp']}</p>
-                        
-                        <hr style="border-color: #30363d;">
-                        
-                        <p style="color: #58a6ff; font-weight:bold; margin-bottom:0;">ISSUE SUMMARY</p>
-                        <p style="margin-top:0;">{row['summary']}</p>
-                        
-                        <p style="color: #58a6ff; font-weight:bold; margin-bottom:0;">DEPARTMENT</p>
-                        <p style="margin-top:0;">{row['department']}</p>
-                        
-                        <p style="color: #58a6ff; font-weight:bold; margin-bottom:0;">AI DIAGNOSIS (RCA)</p>
-                        <p style="margin-top:0;">{row['rca_hypothesis']}</p>
-                        
-                        <div style="background-color: #0d1117; padding: 10px; border-left: 3px solid #2ea043; border-radius: 4px; margin-top:10px;">
-                            <p style="color: #8b949e; font-size: 0.8em; margin:0;">RESOLUTION / RESPONSE SENT:</p>
-                            <p style="margin:5px 0 0 0; font-style:italic;">"{row['response']}"</p>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-        else:
-            st.info("No tickets have been resolved yet.")
+        st.fragment(_history_panel)(store, departments)
 
     # --- TAB 4: DATABASE ---
     with tab_db:
-        st.dataframe(df, use_container_width=True)
+        st.fragment(_database_panel)(store, departments)
+
+    # --- TAB 5: PERFORMANCE ---
+    with tab_perf:
+        st.markdown("#### ⏱ Where the time goes")
+        stages = metrics.stage_summary()
+        if stages:
+            perf = pd.DataFrame(stages)
+            st.dataframe(perf, use_container_width=True, hide_index=True, column_config={
+                "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.1f"),
+                "p95_ms": st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+                "p99_ms": st.column_config.NumberColumn("p99 (ms)", format="%.1f"),
+                "max_ms": st.column_config.NumberColumn("max (ms)", format="%.1f"),
+                "total_s": st.column_config.NumberColumn("total (s)", format="%.2f"),
+            })
+            chart3 = alt.Chart(perf).mark_bar().encode(
+                x=alt.X('p95_ms', title="p95 (ms)"),
+                y=alt.Y('stage', sort=None, title=None),
+                color=alt.value('#d29922')
+            )
+            st.altair_chart(chart3, use_container_width=True)
+        else:
+            st.info("No timings yet. Submit a ticket to populate this view.")
+
+        cache = ticket_store.frame_cache_stats(store)
+        st.caption(f"Frame cache: {cache['hits']} hits · {cache['misses']} full loads · {cache['tail_reads']} incremental reads "
+                   f"({cache['tail_rows']} rows) · {cache['frames']} frames, {cache['bytes'] / 2**20:,.1f} MB")
+
+        counters = {**metrics.counter_values(), **metrics.gauge_values()}
+        if counters:
+            cols = st.columns(min(4, len(counters)))
+            for i, (name, value) in enumerate(sorted(counters.items())):
+                cols[i % len(cols)].metric(name.replace("_total", "").replace("_", " ").title(), f"{value:,}")
+
+        st.download_button("⬇️ Export Prometheus metrics", metrics.prometheus_text(),
+                           file_name="nexus_metrics.prom", mime="text/plain")
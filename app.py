@@ -1,18 +1,20 @@
 import streamlit as st
-import google.generativeai as genai
-import pandas as pd
-import json
-import datetime
-import os
-import uuid 
 import time
-from PIL import Image 
 from dotenv import load_dotenv # AUTO-LOADS KEY FROM .env FILE
 import mock_brain         
 import admin_dashboard    
+import ticket_store
+import triage_cache
+import gemini_client
+import triage
+import archive
+import attachments
+import jobs
+import metrics
 
 # LOAD ENVIRONMENT VARIABLES
 load_dotenv() 
+metrics.start_file_exporter()
 
 # ==========================================
 # 1. PAGE CONFIGURATION & VISUAL THEME
@@ -143,39 +145,150 @@ if st.session_state.auth_status is None:
 # 3. CORE LOGIC
 # ==========================================
 
-CSV_FILE = 'ticket_db.csv'
+store = ticket_store.get_store()
 
-def save_ticket_to_csv(ticket_data):
-    columns = ["ticket_id", "timestamp", "channel", "user_contact", "status", "urgency", "department", "summary", "raw_issue", "response", "sentiment", "is_duplicate", "rca_hypothesis", "slack_draft"]
-    
-    for col in columns:
-        if col not in ticket_data:
-            ticket_data[col] = "N/A"
-
-    df_new = pd.DataFrame([ticket_data])
-    if not os.path.exists(CSV_FILE): df_new.to_csv(CSV_FILE, index=False, columns=columns)
-    else: df_new.to_csv(CSV_FILE, mode='a', header=False, index=False, columns=columns)
-
-def get_active_incidents_context():
-    context_str = "None. System is healthy."
-    if os.path.exists(CSV_FILE):
-        try:
-            df = pd.read_csv(CSV_FILE)
-            active_df = df[(df['status'] == 'Open') & (df['urgency'].isin(['High', 'Critical']))]
-            if not active_df.empty:
-                issues = [f"- {row['summary']} ({row['department']})" for idx, row in active_df.iterrows()]
-                context_str = "\n".join(issues)
-        except: pass 
-    return context_str
+# Triage, ticket persistence and the incident context live in triage.py,
+# shared with the headless ingestion workers (ingestion.py).
+save_ticket_to_csv = triage.save_ticket_to_csv
+get_active_incidents_context = triage.get_active_incidents_context
 
 if "chat_history" not in st.session_state: st.session_state.chat_history = []
+if "attachment_jobs" not in st.session_state: st.session_state.attachment_jobs = {}
+if "voice_uploads" not in st.session_state: st.session_state.voice_uploads = set()
+
+# --- BACKGROUND JOBS (jobs.py) ---
+# Voice notes, attachment preprocessing and triage run off the script thread.
+# Chat entries and previews keep the job id; a fragment polls it, shows the
+# progress (and the reply/log fields as they stream in), and reruns the page
+# once when the job has finished.
+JOB_POLL_SECONDS = 0.5
+AUDIO_TYPES = ["wav", "mp3", "m4a", "ogg", "webm"]
+
+def render_log_fields(fields):
+    # Shared by the live log (partial fields) and the settled chat entry (details)
+    if fields.get("ticket_id"): st.write(f"**Ticket ID:** `{fields['ticket_id']}`")
+    # Colored Urgency
+    urgency = fields.get("urgency")
+    if urgency == 'Critical': st.error(f"**Urgency:** {urgency}")
+    elif urgency == 'High': st.warning(f"**Urgency:** {urgency}")
+    elif urgency: st.info(f"**Urgency:** {urgency}")
+    if "department" in fields: st.write(f"**Department:** {fields['department']}")
+    if fields.get("parent"): st.write(f"**Linked Incident:** `{fields['parent']}`")
+    if "rca_hypothesis" in fields: st.write(f"**RCA Hypothesis:** {fields['rca_hypothesis']}")
+    if "slack_draft" in fields: st.code(f"Ops Alert: {fields['slack_draft']}", language="text")
+
+def render_triage_progress(job):
+    fields = job.partial
+    if "response" in fields: st.write(fields["response"])
+    else: st.caption("⚡ NexusAgent is analyzing your request...")
+    if any(key in fields for key in ("urgency", "department", "rca_hypothesis", "slack_draft")):
+        # RESTORED DETAILED VIEW HERE
+        with st.status("Ticket Intelligence Log", expanded=True, state="running"):
+            render_log_fields({key: value for key, value in fields.items() if key != "ticket_id"})
+
+def render_ticket_log(details, expanded):
+    # The finished log: expanded on the newest reply, collapsed further up the history
+    with st.status("Ticket Intelligence Log", expanded=expanded, state="complete"):
+        render_log_fields(details)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id):
+    job = jobs.get(job_id)
+    if job is None or job.done: st.rerun()
+    if job.kind == "triage": render_triage_progress(job)
+    elif job.kind == "voice":
+        st.markdown("""
+            <div class="listening-overlay">
+                <div class="listening-icon">🎙️</div>
+                <div class="listening-text">Transcribing...</div>
+            </div>
+        """, unsafe_allow_html=True)
+        st.progress(job.progress, text="🎤 Transcribing voice note...")
+    else: st.progress(job.progress, text=job.message)
+
+def submit_triage(text, attachment=None):
+    try:
+        job = jobs.submit("triage", jobs.run_triage, text, api_key, input_channel,
+                          st.session_state.user_info.get('email', 'guest'), attachment=attachment, store=store)
+        st.session_state.chat_history.append({"role": "assistant", "kind": "triage", "job_id": job.id, "content": None})
+    except jobs.JobsBusy:
+        st.session_state.chat_history.append({"role": "assistant", "content": "We're receiving a lot of reports right now. Please send that again in a moment."})
+
+def submit_voice(audio):
+    try:
+        job = jobs.submit("voice", jobs.transcribe_audio, audio.getvalue())
+        st.session_state.chat_history.append({"role": "user", "kind": "voice", "job_id": job.id, "content": None})
+    except jobs.JobsBusy:
+        st.toast("Voice notes are busy, please try again in a moment.", icon="⚠️")
+
+def settle_jobs():
+    # Turns finished jobs into regular chat entries; a transcribed voice note
+    # goes on to triage
+    for msg in list(st.session_state.chat_history):
+        if not msg.get("job_id"): continue
+        job = jobs.get(msg["job_id"])
+        if job is not None and not job.done: continue
+        del msg["job_id"]
+        if job is None or job.state == "failed":
+            error = job.error if job is not None else "the request expired"
+            msg["content"] = f"🎤 [Voice]: could not transcribe ({error})" if msg["kind"] == "voice" else f"Error: {error}"
+        elif msg["kind"] == "voice":
+            msg["content"] = f"🎤 [Voice]: {job.result}"
+            submit_triage(job.result)
+        else:
+            data = job.result.data
+            msg["content"] = data['response']
+            if job.result.is_ticket:
+                parent = data.get("parent_ticket_id")
+                if parent == "N/A": parent = None
+                # STORE DETAILS FOR UI
+                msg["details"] = {
+                    "ticket_id": data["ticket_id"],
+                    "urgency": data["urgency"],
+                    "department": data["department"],
+                    "parent": parent,
+                    "rca_hypothesis": data["rca_hypothesis"],
+                    "slack_draft": data["slack_draft"],
+                }
+
+def attachment_preview(upload, width=None):
+    # Preprocessed once per upload in the background; triage reuses the cached result
+    job = jobs.get(st.session_state.attachment_jobs.get(upload.file_id, ""))
+    if job is None:
+        try: job = jobs.submit("attachment", jobs.prepare_attachment, upload.getvalue())
+        except jobs.JobsBusy:
+            st.caption("Attachment queued behind other uploads...")
+            return
+        st.session_state.attachment_jobs[upload.file_id] = job.id
+    if not job.done: job_progress(job.id)
+    elif job.state == "failed": st.caption(f"⚠️ Could not optimize the attachment: {job.error}")
+    else:
+        if width: st.image(job.result.path, width=width)
+        st.caption(f"Optimized: {job.result.describe()}")
 
 # ==========================================
 # 4. CONDITIONAL UI ROUTING
 # ==========================================
 
-# GET API KEY FROM ENVIRONMENT
-api_key = os.getenv("GEMINI_API_KEY")
+# GET API KEY FROM ENVIRONMENT (or the mock model with GEMINI_MOCK=1)
+api_key = gemini_client.configured_api_key()
+
+# Breaker and rate limiter state (gemini_client.py) is polled, so an outage
+# shows up in the sidebar without waiting for the next full rerun
+STATUS_POLL_SECONDS = 2
+
+@st.fragment(run_every=STATUS_POLL_SECONDS)
+def api_status(is_admin):
+    guard = gemini_client.guard_stats()
+    breaker, limiter = guard["breaker"], guard["limiter"]
+    if breaker["state"] == "open": st.warning(f"⚠️ API Unavailable: using local fallback (retry in {breaker['retry_in']:.0f}s)")
+    elif breaker["state"] == "half-open": st.info("🔄 API Recovering (probing)")
+    elif gemini_client.mock_enabled(): st.success("✅ System Online (Mock Model)")
+    else: st.success("✅ System Online (API Connected)")
+    if is_admin:
+        rate = f"{limiter['tokens']:.0f}/{limiter['capacity']} tokens at {limiter['per_minute']:.0f}/min" if limiter["per_minute"] else "unlimited"
+        st.caption(f"Circuit breaker: {breaker['state']} · {breaker['failures']} consecutive failures")
+        st.caption(f"Rate limiter: {limiter['waiting']} queued · {rate}")
 
 with st.sidebar:
     st.title("NexusAgent")
@@ -187,7 +300,7 @@ with st.sidebar:
     
     # --- STATUS INDICATOR ---
     if api_key:
-        st.success("✅ System Online (API Connected)")
+        api_status(st.session_state.auth_status == "Admin")
     else:
         st.warning("⚠️ Simulation Mode Active")
         if st.session_state.auth_status == "Admin":
@@ -200,10 +313,21 @@ with st.sidebar:
     if st.session_state.auth_status == "Admin":
         st.subheader("🛠️ Admin Controls")
         input_channel = st.selectbox("Simulate Channel Source", ["Web Portal", "Email", "WhatsApp", "Slack"])
+        cache_stats = triage_cache.get_cache().summary()
+        st.caption(f"Triage cache: {cache_stats['hit_rate']:.0%} hit rate · {cache_stats['entries']} cached")
+        job_stats = jobs.get_executor().summary()
+        st.caption(f"Background jobs: {job_stats['running']} running · {job_stats['queued']} queued · {job_stats['workers']} workers")
+        image_stats = attachments.get_pipeline().summary()
+        if image_stats["processed"] or image_stats["cache_hits"]:
+            st.caption(f"Attachments: {image_stats['bytes_saved'] / 1024:,.0f} KB saved · {image_stats['avg_ms']:.0f} ms avg preprocess · {image_stats['hit_rate']:.0%} cached")
+        for client in gemini_client.client_stats():
+            last = client["last_call"] or {"connect_seconds": 0.0, "generate_seconds": 0.0, "first_chunk_seconds": 0.0}
+            st.caption(f"{client['model']}: last call {last['connect_seconds']*1000:.0f} ms connect + {last['first_chunk_seconds']*1000:.0f} ms to first chunk / {last['generate_seconds']*1000:.0f} ms generate · {client['calls']} calls")
         
         st.write("") 
         if st.button("🗑️ Clear Database"):
-            if os.path.exists(CSV_FILE): os.remove(CSV_FILE)
+            store.clear()
+            archive.get_archive().clear()
             st.session_state.chat_history = []
             st.rerun()
     else: st.info("Connected to Corporate Helpdesk")
@@ -215,8 +339,9 @@ with st.sidebar:
         st.rerun()
 
 # --- VARIABLES FOR DEMO ---
-uploaded_img = None 
-voice_simulation = False
+attachment_bytes = None
+
+settle_jobs()
 
 # --- USER VIEW ---
 if st.session_state.auth_status == "User":
@@ -226,71 +351,64 @@ if st.session_state.auth_status == "User":
     with u_tab1:
         for msg in st.session_state.chat_history:
             with st.chat_message(msg["role"]): 
+                if msg.get("job_id"):
+                    job_progress(msg["job_id"])
+                    continue
                 st.write(msg["content"])
                 # Render Detailed Logic if available
-                if "details" in msg:
-                    with st.status("Ticket Intelligence Log", expanded=False):
-                        st.write(f"**ID:** `{msg['details']['ticket_id']}`")
-                        st.write(f"**Urgency:** {msg['details']['urgency']}")
-                        st.write(f"**Department:** {msg['details']['department']}")
-                        st.info(f"**Hypothesis:** {msg['details']['rca']}")
+                if "details" in msg: render_ticket_log(msg["details"], msg is st.session_state.chat_history[-1])
 
         # DEMO CONTROLS (Voice & Image)
         c_voice, c_upload, c_space = st.columns([1,1,3])
         with c_voice:
-            # === THE PULSING ANIMATION LOGIC ===
-            if st.button("🎤 Voice Note"):
-                popup = st.empty()
-                popup.markdown("""
-                    <div class="listening-overlay">
-                        <div class="listening-icon">🎙️</div>
-                        <div class="listening-text">Listening...</div>
-                    </div>
-                """, unsafe_allow_html=True)
-                
-                time.sleep(5.0) # 5 Seconds Wait
-                popup.empty()   # Disappear
-                
-                voice_simulation = True
-                st.toast("Transcribed!", icon="✅")
+            # Recorded or uploaded; transcribed in the background (transcription.py)
+            with st.popover("🎤 Voice Note"):
+                recording = st.audio_input("Record", key="voice_record")
+                voice_file = st.file_uploader("Or upload audio", type=AUDIO_TYPES, key="voice_file")
+            for audio in (recording, voice_file):
+                if audio is not None and audio.file_id not in st.session_state.voice_uploads:
+                    st.session_state.voice_uploads.add(audio.file_id)
+                    submit_voice(audio)
+                    st.rerun()
                 
         with c_upload:
             uploaded_file = st.file_uploader("📎 Attach", type=['png','jpg'], label_visibility="collapsed")
             if uploaded_file:
-                uploaded_img = Image.open(uploaded_file)
-                st.image(uploaded_img, width=150)
+                attachment_bytes = uploaded_file.getvalue()
+                attachment_preview(uploaded_file, width=150)
 
         # INPUT HANDLING
-        default_val = "My server room is overheating!" if voice_simulation else ""
-        
-        if voice_simulation:
-             st.session_state.chat_history.append({"role": "user", "content": f"🎤 [Voice]: {default_val}"})
-             user_input = default_val 
-        else:
-            user_input = st.chat_input("Describe your issue...")
-            if user_input: st.session_state.chat_history.append({"role": "user", "content": user_input})
+        user_input = st.chat_input("Describe your issue...")
+        if user_input: st.session_state.chat_history.append({"role": "user", "content": user_input})
 
     with u_tab2:
         search_id = st.text_input("Enter Ticket ID (e.g., TKT-123)")
         if st.button("Track"):
-            if os.path.exists(CSV_FILE):
-                try:
-                    df = pd.read_csv(CSV_FILE)
-                    ticket = df[df['ticket_id'].str.contains(search_id.upper().strip(), na=False)]
-                    if not ticket.empty:
-                        row = ticket.iloc[0]
-                        s_color = "#00ff00" if row['status'] == 'Resolved' else "#58a6ff" if row['status'] == 'In Progress' else "#ffffff"
-                        
-                        st.markdown(f"""
-                        <div class="status-card">
-                            <h3>Ticket: {row['ticket_id']}</h3>
-                            <p><strong>Status:</strong> <span style="color: {s_color}; font-weight: bold;">{row['status']}</span></p>
-                            <p><strong>Department:</strong> {row['department']}</p>
-                            <p><strong>Summary:</strong> {row['summary']}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else: st.error("Ticket not found.")
-                except: st.error("Database Error")
+            try:
+                query = ticket_store.normalize_ticket_id(search_id)
+                row = store.get_ticket(query)
+                matches = []
+                if row is None:
+                    matches = store.find_by_prefix(query, limit=5)
+                    if len(matches) == 1: row = matches[0]
+                    elif matches:
+                        st.warning("Several tickets match that ID: " + ", ".join(m['ticket_id'] for m in matches))
+                    # Resolved tickets older than ARCHIVE_AFTER_DAYS only live in the Parquet
+                    # archive; the store's ticket_id -> part index points at the one file to read
+                    else: row = archive.ResolvedHistory(store, archive.get_archive()).get_ticket(query)
+                if row:
+                    s_color = "#00ff00" if row['status'] == 'Resolved' else "#58a6ff" if row['status'] == 'In Progress' else "#ffffff"
+                    
+                    st.markdown(f"""
+                    <div class="status-card">
+                        <h3>Ticket: {row['ticket_id']}</h3>
+                        <p><strong>Status:</strong> <span style="color: {s_color}; font-weight: bold;">{row['status']}</span></p>
+                        <p><strong>Department:</strong> {row['department']}</p>
+                        <p><strong>Summary:</strong> {row['summary']}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                elif len(matches) < 2: st.error("Ticket not found.")
+            except: st.error("Database Error")
 
 # --- ADMIN VIEW ---
 elif st.session_state.auth_status == "Admin":
@@ -299,12 +417,16 @@ elif st.session_state.auth_status == "Admin":
         st.subheader(f"Incoming: {input_channel}")
         for msg in st.session_state.chat_history:
             with st.chat_message(msg["role"]): 
+                if msg.get("job_id"):
+                    job_progress(msg["job_id"])
+                    continue
                 st.write(msg["content"])
-                if "details" in msg:
-                    st.caption(f"Details: {msg['details']['ticket_id']} | {msg['details']['urgency']}")
+                if "details" in msg: render_ticket_log(msg["details"], msg is st.session_state.chat_history[-1])
         
         up_file = st.file_uploader("Simulate Attachment", type=['png','jpg'], key="ad_up")
-        if up_file: uploaded_img = Image.open(up_file)
+        if up_file:
+            attachment_bytes = up_file.getvalue()
+            attachment_preview(up_file)
         user_input = st.chat_input("Simulate ticket...")
         
     with tab2:
@@ -314,157 +436,7 @@ elif st.session_state.auth_status == "Admin":
 # 5. SMART LOGIC (API + SIMULATION FALLBACK)
 # ==========================================
 
+# Triage runs as a background job; the chat entry added here polls it
 if 'user_input' in locals() and user_input:
-    
-    text_response = ""
-    used_simulation = False
-
-    try:
-        # CHECK IF API KEY EXISTS IN ENV
-        if api_key:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel("gemini-2.0-flash-lite-001")
-            
-            # === THE STRICT BRAIN (REAL API) ===
-            prompt = f"""
-            You are NexusAgent, an elite IT Incident Commander.
-            
-            ### INPUT ANALYSIS
-            User Input: "{user_input}"
-            Context: The user is an employee reporting an issue.
-            
-            ### STRICT URGENCY RULES (FOLLOW THESE):
-            1. **CRITICAL** (Red Alert): 
-               - Safety hazards (Fire, Smoke, Sparks).
-               - Security breaches (Hacked, Ransomware).
-               - Total System Failure (Server Room down, ERP offline).
-            2. **HIGH** (Urgent):
-               - Hardware Failure preventing work (Laptop crash, Blue Screen, Broken Screen, Won't Turn On).
-               - Key software not opening (Zoom, Office, Login failed).
-            3. **MEDIUM** (Normal):
-               - WiFi slow, Printer jammed, VPN disconnecting.
-               - Single app glitching but usable.
-            4. **LOW** (Backlog):
-               - Password reset, Access request, "How do I..." questions.
-               - Feature requests or generic feedback.
-
-            ### SENTIMENT ANALYSIS:
-            - Detect if user is "Panic", "Angry", "Frustrated", or "Neutral".
-
-            ### OUTPUT FORMAT (JSON ONLY):
-            {{
-                "is_duplicate": false,
-                "department": "Hardware" | "Software" | "Network" | "Access" | "General",
-                "urgency": "Critical" | "High" | "Medium" | "Low",
-                "summary": "Short Technical Title (Max 6 words)",
-                "rca_hypothesis": "One sentence technical guess on root cause.",
-                "response": "Empathetic professional reply to the user (max 1 sentence).",
-                "slack_draft": "🚨 [URGENCY] [DEPT]: [Summary] - [RCA]",
-                "sentiment": "Neutral" | "Panic" | "Angry",
-                "status": "Open"
-            }}
-            """
-            
-            with st.spinner("⚡ NexusAgent is analyzing your request..."):
-                if uploaded_img: response = model.generate_content([prompt, uploaded_img])
-                else: response = model.generate_content(prompt)
-                text_response = response.text
-
-        else: raise Exception("No Key in .env")
-    
-    except Exception as e:
-        # === THE SMART FALLBACK (SIMULATION) ===
-        used_simulation = True
-        user_input_lower = user_input.lower()
-        
-        # LOGIC: Image Detected
-        if uploaded_img:
-            simulated_json = {
-                "is_duplicate": False, "department": "Hardware", "urgency": "High",
-                "summary": "Visual Error Detected (OCR)",
-                "rca_hypothesis": "Image analysis detected 'Critical_Process_Died' error code.",
-                "response": "I have analyzed your screenshot. It appears to be a Critical System Failure (Blue Screen). I have alerted the Hardware Team immediately.",
-                "slack_draft": "🚨 IMAGE ALERT: BSOD detected.", "sentiment": "Panic", "status": "Open"
-            }
-        
-        # LOGIC: Critical Fire/Smoke
-        elif "fire" in user_input_lower or "smoke" in user_input_lower:
-            simulated_json = {
-                "department": "Hardware", "urgency": "Critical", 
-                "summary": "Fire Hazard", "rca_hypothesis": "Potential Thermal Runaway",
-                "response": "CRITICAL: Evacuate immediately. Fire safety team dispatched.",
-                "slack_draft": "🚨 FIRE DETECTED.", "sentiment": "Panic", "status": "Open", "is_duplicate": False
-            }
-        
-        # LOGIC: High Priority Hardware (Laptop/Screen/Crash)
-        elif any(x in user_input_lower for x in ["laptop", "screen", "computer", "not working", "crash", "broken", "won't turn on"]):
-            simulated_json = {
-                "department": "Hardware", "urgency": "High", 
-                "summary": "Hardware Malfunction", "rca_hypothesis": "User reported critical device failure.",
-                "response": "I have logged a High Priority hardware ticket. A technician will review your device status shortly.",
-                "slack_draft": "🚨 HARDWARE FAILURE: User unable to work.", "sentiment": "Frustrated", "status": "Open", "is_duplicate": False
-            }
-            
-        # LOGIC: Spam/Incomplete
-        elif len(user_input) < 4:
-             simulated_json = { "status": "Ignored", "response": "Please provide a detailed issue.", "sentiment": "Neutral" }
-        
-        # LOGIC: Low Priority General
-        else:
-            simulated_json = {
-                "department": "Support", "urgency": "Low", 
-                "summary": "General Inquiry", "rca_hypothesis": "User reported issue.",
-                "response": f"Ticket created. A support agent will check this shortly.",
-                "slack_draft": "Info: New ticket logged.", "sentiment": "Neutral", "status": "Open", "is_duplicate": False
-            }
-        text_response = json.dumps(simulated_json)
-
-    try:
-        clean_text = text_response.strip().replace("```json", "").replace("```", "")
-        data = json.loads(clean_text)
-        
-        if data.get("status") == "Open":
-            data["ticket_id"] = f"TKT-{str(uuid.uuid4())[:6].upper()}"
-            data["timestamp"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            data["channel"] = input_channel
-            data["user_contact"] = st.session_state.user_info.get('email', 'guest')
-            data["raw_issue"] = user_input + (" [Image Attached]" if uploaded_img else "")
-            
-            save_ticket_to_csv(data)
-            
-            # STORE DETAILS FOR UI
-            msg_details = {
-                "ticket_id": data["ticket_id"],
-                "urgency": data["urgency"],
-                "department": data["department"],
-                "rca": data["rca_hypothesis"]
-            }
-            
-            st.session_state.chat_history.append({"role": "assistant", "content": data['response'], "details": msg_details})
-            
-            # Show Response immediately
-            msg_area = tab1 if st.session_state.auth_status == "Admin" else u_tab1
-            with msg_area:
-                with st.chat_message("assistant"):
-                    st.write(data['response'])
-                    # RESTORED DETAILED VIEW HERE
-                    with st.status("Ticket Intelligence Log", expanded=True):
-                        st.write(f"**Ticket ID:** `{data['ticket_id']}`")
-                        
-                        # Colored Urgency
-                        if data['urgency'] == 'Critical': st.error(f"**Urgency:** {data['urgency']}")
-                        elif data['urgency'] == 'High': st.warning(f"**Urgency:** {data['urgency']}")
-                        else: st.info(f"**Urgency:** {data['urgency']}")
-                        
-                        st.write(f"**Department:** {data['department']}")
-                        st.write(f"**RCA Hypothesis:** {data['rca_hypothesis']}")
-                        st.code(f"Ops Alert: {data['slack_draft']}", language="text")
-
-        else:
-             st.session_state.chat_history.append({"role": "assistant", "content": data['response']})
-             msg_area = tab1 if st.session_state.auth_status == "Admin" else u_tab1
-             with msg_area:
-                 with st.chat_message("assistant"):
-                     st.write(data['response'])
-
-    except Exception as e: st.error(f"Error: {e}")
+    submit_triage(user_input, attachment=attachment_bytes)
+    st.rerun()
@@ -0,0 +1,274 @@
+import os
+import sys
+import shutil
+import datetime
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+import ticket_store
+import metrics
+
+# ==========================================
+# COLD TIER: ARCHIVED RESOLVED TICKETS
+# ==========================================
+# Resolved tickets are most of the volume, but only the Resolved History tab
+# reads them. archive_resolved() moves the ones older than ARCHIVE_AFTER_DAYS
+# out of the ticket store into month-partitioned Parquet files:
+#
+#   ticket_archive/month=2025-01/part-<first row id>-<last row id>.parquet
+#
+# The hot store, and every index, frame and query built on it, then holds the
+# open and in-progress tickets plus the recently resolved ones. Reads go
+# through ResolvedHistory:
+#   - months outside a date filter are never opened;
+#   - date and department predicates are pushed down to row-group statistics
+#     (rows are sorted by department, then timestamp, within a file);
+#   - files are memory-mapped;
+#   - a single ticket (Track Status, the history card) is read from the one
+#     part file that holds it: archive_rows() records ticket_id -> part in the
+#     store, in the same transaction as the delete.
+#
+#   python archive.py --older-than 30
+#   python archive.py --older-than 30 --dry-run
+#
+# Files are written before the rows are deleted, and a part only counts once
+# the delete has recorded it in the store's ticket_id -> part index. A run
+# interrupted in between leaves a part nobody indexed, with its rows still in
+# the store; the next run deletes it before archiving those rows again, so the
+# archive never holds a ticket twice.
+#
+# .env settings:
+#   ARCHIVE_DIR         where partitions live (default ticket_archive/)
+#   ARCHIVE_AFTER_DAYS  age in days before a resolved ticket is archived (default 30)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ARCHIVE_DIR = os.path.join(BASE_DIR, "ticket_archive")
+DEFAULT_AFTER_DAYS = 30
+DEFAULT_BATCH_SIZE = 20000
+ROW_GROUP_ROWS = 16384
+
+SCHEMA = pa.schema([(col, pa.string()) for col in ticket_store.COLUMNS])
+PUSHDOWN_FILTERS = ["since", "until", "department", "ticket_id"]
+
+
+def _month_range(filters):
+    since, until = filters.get("since"), filters.get("until")
+    return (since[:7] if since else None), (until[:7] if until else None)
+
+
+class TicketArchive:
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR):
+        self.root = root
+
+    def months(self, since=None, until=None):
+        if not os.path.isdir(self.root): return []
+        months = sorted(name.split("=", 1)[1] for name in os.listdir(self.root) if name.startswith("month="))
+        return [m for m in months if (since is None or m >= since) and (until is None or m <= until)]
+
+    def files(self, month):
+        folder = os.path.join(self.root, f"month={month}")
+        return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".parquet"))
+
+    def clear(self):
+        # Clear Database: the hot store resets its archived_rollup, this drops the files
+        if os.path.isdir(self.root): shutil.rmtree(self.root)
+
+    # --- WRITE ---
+    # Returns {part (path relative to the root): [ticket_id, ...]}
+    def write(self, rows):
+        by_month = {}
+        for row in rows: by_month.setdefault(str(row["timestamp"])[:7], []).append(row)
+        written = {}
+        for month, month_rows in by_month.items():
+            month_rows.sort(key=lambda r: (r["department"], r["timestamp"]))
+            row_ids = [r["row_id"] for r in month_rows]
+            folder = os.path.join(self.root, f"month={month}")
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"part-{min(row_ids):012d}-{max(row_ids):012d}.parquet")
+            table = pa.Table.from_pylist([{c: str(r[c]) for c in ticket_store.COLUMNS} for r in month_rows], schema=SCHEMA)
+            tmp = f"{path}.tmp"
+            pq.write_table(table, tmp, row_group_size=ROW_GROUP_ROWS, compression="zstd")
+            os.replace(tmp, path)
+            written[os.path.relpath(path, self.root)] = [str(r["ticket_id"]) for r in month_rows]
+        return written
+
+    # --- READ ---
+    def _expression(self, filters):
+        expr = None
+        for key, value in ticket_store._active_filters(filters).items():
+            if key == "since": term = pc.field("timestamp") >= value
+            elif key == "until": term = pc.field("timestamp") < value
+            elif key in ("department", "ticket_id"):
+                term = pc.field(key).isin(value) if isinstance(value, list) else pc.field(key) == value
+            else: continue
+            expr = term if expr is None else expr & term
+        return expr
+
+    def read(self, columns, filters=None, months=None):
+        filters = filters or {}
+        months = self.months(*_month_range(filters)) if months is None else months
+        files = [path for month in months for path in self.files(month)]
+        if not files: return pd.DataFrame(columns=columns)
+        table = pq.read_table(files, columns=columns, filters=self._expression(filters), memory_map=True, partitioning=None)
+        return table.to_pandas()
+
+    def count(self, filters=None, months=None):
+        filters = filters or {}
+        months = self.months(*_month_range(filters)) if months is None else months
+        if not any(key in PUSHDOWN_FILTERS for key in ticket_store._active_filters(filters)):
+            # Unfiltered: the row count is in each file's footer
+            return sum(pq.ParquetFile(path, memory_map=True).metadata.num_rows for month in months for path in self.files(month))
+        return len(self.read(["timestamp"], filters, months))
+
+    def query_page(self, columns, filters=None, offset=0, limit=50):
+        # Newest first, one month at a time: months before the page are skipped
+        # by count, and reading stops once the page is full
+        filters = filters or {}
+        columns = list(dict.fromkeys(list(columns) + ["timestamp"]))
+        pages = []
+        for month in reversed(self.months(*_month_range(filters))):
+            if limit <= 0: break
+            in_month = self.count(filters, [month])
+            if offset >= in_month:
+                offset -= in_month
+                continue
+            rows = self.read(columns, filters, [month]).sort_values("timestamp", ascending=False, kind="stable")
+            pages.append(rows.iloc[offset:offset + limit])
+            limit -= len(pages[-1])
+            offset = 0
+        if not pages: return pd.DataFrame(columns=columns)
+        return pd.concat(pages, ignore_index=True)
+
+    def get_ticket(self, ticket_id, columns=ticket_store.CARD_COLUMNS, month=None, part=None):
+        # part: read just that file; month: just that partition; neither: every file
+        if part is not None:
+            path = os.path.join(self.root, part)
+            if not os.path.exists(path): return None
+            table = pq.read_table(path, columns=list(columns), filters=pc.field("ticket_id") == ticket_id, memory_map=True, partitioning=None)
+            rows = table.to_pandas()
+        else:
+            months = [month] if month and month in self.months() else None
+            rows = self.read(list(columns), {"ticket_id": ticket_id}, months)
+        return rows.iloc[0].to_dict() if len(rows) else None
+
+    def parts(self):
+        return [os.path.relpath(path, self.root) for month in self.months() for path in self.files(month)]
+
+    def stats(self):
+        months = self.months()
+        files = [path for month in months for path in self.files(month)]
+        return {"months": len(months), "files": len(files), "rows": self.count(months=months),
+                "bytes": sum(os.path.getsize(path) for path in files)}
+
+
+# --- HOT + COLD READS (Resolved History tab) ---
+# Same query_page/count_matching/get_ticket surface as a ticket store, so the
+# dashboard pages it the same way: resolved tickets still in the hot store
+# come first (they are the recent ones), then the archive, newest first.
+class ResolvedHistory:
+    def __init__(self, store, archive):
+        self.store = store
+        self.archive = archive
+
+    def version(self):
+        # Archiving deletes from the store, which bumps its version too
+        return self.store.version()
+
+    def _hot_filters(self, filters):
+        return {**(filters or {}), "status": "Resolved"}
+
+    def count_matching(self, filters=None):
+        return self.store.count_matching(self._hot_filters(filters)) + self.archive.count(filters)
+
+    def query_page(self, columns=None, filters=None, sort_by="timestamp", descending=True, offset=0, limit=50):
+        columns = columns or ticket_store.COLUMNS
+        hot_count = self.store.count_matching(self._hot_filters(filters))
+        pages = []
+        if offset < hot_count:
+            pages.append(self.store.query_page(columns, self._hot_filters(filters), sort_by, descending, offset, limit))
+        remaining = limit - sum(len(p) for p in pages)
+        if remaining > 0:
+            cold = self.archive.query_page(columns, filters, max(0, offset - hot_count), remaining)
+            if len(cold): pages.append(ticket_store.typed_frame(cold[columns]))
+        if not pages: return pd.DataFrame(columns=columns)
+        if len(pages) == 1: return pages[0]
+        return ticket_store.concat_typed(pages[0], pages[1])
+
+    def get_ticket(self, ticket_id, columns=ticket_store.CARD_COLUMNS, timestamp=None):
+        # Never scans the whole archive: without an indexed part or a timestamp
+        # (a mistyped id in Track Status) the ticket is simply not found
+        row = self.store.get_ticket(ticket_id, columns=columns)
+        if row is not None: return row
+        part = self.store.archived_part(ticket_id) if hasattr(self.store, "archived_part") else None
+        if part is not None: return self.archive.get_ticket(ticket_id, columns, part=part)
+        if timestamp: return self.archive.get_ticket(ticket_id, columns, month=str(timestamp)[:7])
+        return None
+
+
+def get_archive():
+    return TicketArchive(os.getenv("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR))
+
+
+# --- ARCHIVAL JOB ---
+# Archives written before the ticket_id -> part index existed are indexed once.
+# A part whose tickets are still in the store was never committed and is dropped.
+def index_parts(store, archive):
+    if store.get_meta("archive_indexed") is not None: return
+    for part in archive.parts():
+        path = os.path.join(archive.root, part)
+        ids = pq.read_table(path, columns=["ticket_id"], partitioning=None).column("ticket_id").to_pylist()
+        if ids and store.get_ticket(ids[0]) is not None: os.remove(path)
+        else: store.index_archived([(t, part) for t in ids])
+    store.set_meta("archive_indexed", datetime.datetime.now().strftime(ticket_store.TIMESTAMP_FORMAT))
+
+def drop_uncommitted(store, archive):
+    committed = store.archived_parts()
+    dropped = [part for part in archive.parts() if part not in committed]
+    for part in dropped: os.remove(os.path.join(archive.root, part))
+    return len(dropped)
+
+def archive_resolved(store, archive, older_than_days, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    if not hasattr(store, "archive_rows"):
+        raise RuntimeError(f"Archiving needs the sqlite ticket store, not {store.backend}")
+    if not dry_run:
+        index_parts(store, archive)
+        drop_uncommitted(store, archive)
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=older_than_days)).strftime(ticket_store.TIMESTAMP_FORMAT)
+    totals = {"archived": 0, "files": 0}
+    for batch in store.iter_batches(ticket_store.COLUMNS, batch_size, statuses=["Resolved"]):
+        rows = [row for row in batch if row["timestamp"] < cutoff]
+        if not rows: continue
+        if not dry_run:
+            written = archive.write(rows)
+            totals["files"] += len(written)
+            store.archive_rows([row["row_id"] for row in rows], [(t, part) for part, ids in written.items() for t in ids])
+            metrics.inc("tickets_archived_total", len(rows))
+        totals["archived"] += len(rows)
+    totals["cutoff"] = cutoff
+    return totals
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Move old resolved tickets to the Parquet archive")
+    parser.add_argument("--older-than", type=float, default=float(os.getenv("ARCHIVE_AFTER_DAYS", DEFAULT_AFTER_DAYS)),
+                        help="archive resolved tickets older than this many days")
+    parser.add_argument("--archive-dir", default=os.getenv("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="count what would be archived, but move nothing")
+    args = parser.parse_args()
+
+    store = ticket_store.get_store()
+    archive = TicketArchive(args.archive_dir)
+    try:
+        result = archive_resolved(store, archive, args.older_than, args.batch_size, args.dry_run)
+    except RuntimeError as exc:
+        sys.exit(str(exc))
+    verb = "Would archive" if args.dry_run else "Archived"
+    print(f"{verb} {result['archived']:,} resolved tickets older than {result['cutoff']} ({result['files']} files written)")
+    stats = archive.stats()
+    print(f"Archive: {stats['rows']:,} tickets in {stats['files']} files over {stats['months']} months "
+          f"({stats['bytes'] / 2**20:,.1f} MB); hot store: {store.count():,} tickets")
@@ -0,0 +1,138 @@
+import io
+import os
+import time
+import hashlib
+import threading
+from PIL import Image, ImageOps
+
+# ==========================================
+# ATTACHMENT PREPROCESSING (CONTENT-ADDRESSED)
+# ==========================================
+# A phone screenshot can be several MB. Uploads are shrunk to a maximum edge,
+# re-encoded to a compact format with metadata (EXIF, GPS, ICC) stripped, and
+# the result is stored under the SHA-256 of the original bytes. Uploading the
+# same screenshot again is a file lookup, and because triage_cache keys on the
+# same digest, it usually skips the model call as well.
+#
+# .env settings:
+#   ATTACHMENT_MAX_EDGE   longest side in pixels after resizing (default 1024)
+#   ATTACHMENT_FORMAT     webp (default), jpeg or png
+#   ATTACHMENT_QUALITY    encoder quality for webp/jpeg (default 80)
+#   ATTACHMENT_CACHE_DIR  where processed files live (default attachment_cache/)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, "attachment_cache")
+
+DEFAULT_MAX_EDGE = 1024
+DEFAULT_FORMAT = "webp"
+DEFAULT_QUALITY = 80
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg", "png": "png"}
+
+
+class PreparedAttachment:
+    def __init__(self, digest, path, original_bytes, processed_bytes, seconds, from_cache):
+        self.digest = digest
+        self.path = path
+        self.original_bytes = original_bytes
+        self.processed_bytes = processed_bytes
+        self.seconds = seconds
+        self.from_cache = from_cache
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - self.processed_bytes
+
+    @property
+    def image(self):
+        # Opened from the processed file: the Gemini client uploads a file-backed
+        # image's bytes as they are instead of re-encoding the pixels. Loaded and
+        # closed here, so the image keeps its filename but not a file handle.
+        with Image.open(self.path) as img:
+            img.load()
+        return img
+
+    def describe(self):
+        source = "cached" if self.from_cache else f"{self.seconds * 1000:.0f} ms"
+        return f"{self.original_bytes / 1024:,.0f} KB → {self.processed_bytes / 1024:,.0f} KB ({source})"
+
+
+class AttachmentPipeline:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_edge=DEFAULT_MAX_EDGE, fmt=DEFAULT_FORMAT, quality=DEFAULT_QUALITY):
+        if fmt not in EXTENSIONS: raise ValueError(f"Unsupported ATTACHMENT_FORMAT: {fmt}")
+        self.cache_dir = cache_dir
+        self.max_edge = max_edge
+        self.fmt = fmt
+        self.quality = quality
+        self.lock = threading.Lock()
+        self.stats = {"processed": 0, "cache_hits": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+
+    def path_for(self, digest):
+        # The settings are part of the name, so changing them never serves stale output
+        name = f"{digest}-{self.max_edge}-q{self.quality}.{EXTENSIONS[self.fmt]}"
+        return os.path.join(self.cache_dir, digest[:2], name)
+
+    def prepare(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            prepared = PreparedAttachment(digest, path, len(data), os.path.getsize(path), 0.0, True)
+            with self.lock:
+                self.stats["cache_hits"] += 1
+                self.stats["bytes_in"] += prepared.original_bytes
+                self.stats["bytes_out"] += prepared.processed_bytes
+            return prepared
+
+        started = time.perf_counter()
+        encoded = self._encode(data)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f: f.write(encoded)
+        os.replace(tmp, path)
+        seconds = time.perf_counter() - started
+
+        with self.lock:
+            self.stats["processed"] += 1
+            self.stats["bytes_in"] += len(data)
+            self.stats["bytes_out"] += len(encoded)
+            self.stats["seconds"] += seconds
+        return PreparedAttachment(digest, path, len(data), len(encoded), seconds, False)
+
+    def _encode(self, data):
+        with Image.open(io.BytesIO(data)) as img:
+            # Honour the camera's rotation before the EXIF block is dropped
+            img = ImageOps.exif_transpose(img)
+            if self.fmt == "jpeg": img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+                img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+            img.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+            out = io.BytesIO()
+            # Saved without exif/icc_profile arguments, so no metadata is carried over
+            if self.fmt == "png": img.save(out, format="PNG", optimize=True)
+            else: img.save(out, format=self.fmt.upper(), quality=self.quality, optimize=True)
+            return out.getvalue()
+
+    def summary(self):
+        with self.lock:
+            stats = dict(self.stats)
+        handled = stats["processed"] + stats["cache_hits"]
+        return {
+            **stats,
+            "bytes_saved": stats["bytes_in"] - stats["bytes_out"],
+            "avg_ms": stats["seconds"] / stats["processed"] * 1000 if stats["processed"] else 0.0,
+            "hit_rate": stats["cache_hits"] / handled if handled else 0.0,
+        }
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = AttachmentPipeline(os.getenv("ATTACHMENT_CACHE_DIR", DEFAULT_CACHE_DIR),
+                                               max_edge=int(os.getenv("ATTACHMENT_MAX_EDGE", DEFAULT_MAX_EDGE)),
+                                               fmt=os.getenv("ATTACHMENT_FORMAT", DEFAULT_FORMAT).lower(),
+                                               quality=int(os.getenv("ATTACHMENT_QUALITY", DEFAULT_QUALITY)))
+    return _pipeline
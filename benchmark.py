@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import subprocess
+import ticket_store
+import incident_view
+import rule_engine
+import mock_brain
+import triage
+import admin_dashboard
+
+# ==========================================
+# BENCHMARK SUITE (SYNTHETIC TICKETS)
+# ==========================================
+# Times the hot paths against a seeded synthetic ticket history at several
+# scales, and writes the numbers to JSON so runs can be compared:
+#
+#   python benchmark.py                                  # 10k, 100k, 1M on sqlite
+#   python benchmark.py --scales 10k,100k --backend csv
+#   python benchmark.py --compare bench_results/baseline.json --threshold 0.2
+#
+# With --compare, any benchmark whose p50 regressed by more than --threshold
+# is listed and the exit code is 1.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(BASE_DIR, "bench_results")
+DEFAULT_SCALES = "10k,100k,1M"
+
+CHANNELS = ["Web Portal", "Email", "WhatsApp", "Slack"]
+STATUS_WEIGHTS = {"Open": 0.08, "In Progress": 0.04, "Resolved": 0.88}
+ISSUE_TEMPLATES = {
+    "safety_hazard": ["There is {kw} coming from the server room", "I can see {kw} near the printer on floor {n}",
+                      "Small {kw} under desk {n}, please hurry"],
+    "possible_hazard": ["Reported {kw} near rack {n}", "Facilities: {kw} in meeting room {n}"],
+    "service_degradation": ["{kw} is really bad today", "My {kw} keeps dropping every few minutes",
+                            "Floor {n}: {kw} issues since this morning"],
+    "hardware_failure": ["My {kw} after the update", "{kw} on my laptop, can't work",
+                         "Desk {n} monitor {kw}"],
+    "access_request": ["How do I reset my {kw}?", "Question about {kw} for project {n}",
+                       "Help with {kw} on account {n}"],
+    "general_inquiry": ["Can someone install Visio on my machine?", "Where do I request a second monitor?"],
+}
+
+
+# --- SYNTHETIC DATA ---
+def parse_scale(text):
+    text = text.strip().lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
+
+def generate_tickets(count, seed=42, start=None):
+    # Same column set as save_ticket_to_csv; rule outputs keep urgency/department/summary consistent
+    rng = random.Random(seed)
+    start = start or datetime.datetime(2025, 1, 1)
+    step = 90 * 86400 / max(count, 1)
+    rules = rule_engine.RULES + [rule_engine.DEFAULT_RULE]
+    weights = [0.03, 0.02, 0.35, 0.25, 0.15, 0.20]
+    statuses, status_weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+    seen = set()
+    tickets = []
+    for i in range(count):
+        ticket_id = f"TKT-{rng.getrandbits(24):06X}"
+        while ticket_id in seen: ticket_id = f"TKT-{rng.getrandbits(24):06X}"
+        seen.add(ticket_id)
+        rule = rng.choices(rules, weights)[0]
+        template = rng.choice(ISSUE_TEMPLATES[rule["name"]])
+        raw_issue = template.format(kw=rng.choice(rule.get("keywords") or ["issue"]), n=rng.randint(1, 40))
+        has_image = rng.random() < 0.05
+        tickets.append({
+            "ticket_id": ticket_id,
+            "timestamp": (start + datetime.timedelta(seconds=i * step)).strftime("%Y-%m-%d %H:%M:%S"),
+            "channel": rng.choice(CHANNELS),
+            "user_contact": f"user{rng.randint(1, 5000)}@nexus.corp",
+            "raw_issue": raw_issue + (" [Image Attached]" if has_image else ""),
+            "is_duplicate": "False",
+            **{field: rule[field] for field in rule_engine.TICKET_FIELDS},
+            "status": rng.choices(statuses, status_weights)[0],
+        })
+    return [ticket_store.normalize_ticket(t) for t in tickets]
+
+
+# --- TIMING ---
+def measure(fn, repeat=1, warmup=0):
+    for _ in range(warmup): fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return {"n": repeat, "mean_ms": sum(samples) / len(samples) * 1000,
+            "p50_ms": pick(0.50), "p95_ms": pick(0.95), "max_ms": samples[-1] * 1000}
+
+def open_store(backend, path):
+    return ticket_store.CsvTicketStore(path) if backend == "csv" else ticket_store.SQLiteTicketStore(path)
+
+
+def bench_scale(count, backend, seed, workdir, repeat):
+    path = os.path.join(workdir, f"bench_{count}.{'csv' if backend == 'csv' else 'sqlite'}")
+    results = {"rows": count}
+
+    tickets = generate_tickets(count, seed)
+    store = open_store(backend, path)
+    started = time.perf_counter()
+    for i in range(0, count, 50_000): store.insert_many(tickets[i:i + 50_000])
+    results["bulk_load_s"] = time.perf_counter() - started
+
+    # Track Status: exact id, then prefix fallback
+    rng = random.Random(seed + 1)
+    sample_ids = [rng.choice(tickets)["ticket_id"] for _ in range(repeat)]
+    ids = iter(sample_ids)
+    results["track_lookup"] = measure(lambda: store.get_ticket(next(ids)), repeat)
+    prefixes = iter([tid[:8] for tid in sample_ids])
+    results["track_prefix_lookup"] = measure(lambda: store.find_by_prefix(next(prefixes), limit=5), repeat)
+
+    # Active-incident context: first call builds the view, later calls reuse it
+    results["incident_context_cold"] = measure(lambda: triage.get_active_incidents_context(store))
+    results["incident_context_warm"] = measure(lambda: triage.get_active_incidents_context(store), repeat)
+
+    # Dashboard, as the Agent Terminal reads it: the headline metrics and chart
+    # counts, then a refresh poll that finds the store unchanged
+    results["dashboard_metrics"] = measure(lambda: admin_dashboard.summarize(store), 10, warmup=1)
+    results["dashboard_poll_idle"] = measure(lambda: admin_dashboard.live_summary(store), repeat, warmup=1)
+
+    # Dashboard tables: one page of the default Database view, the queue, and a filtered view
+    def page(filters, columns, sort_by=None, descending=False):
+        return lambda: (store.count_matching(filters), store.query_page(columns, filters, sort_by, descending, 0, 50))
+    results["dashboard_db_page"] = measure(page({}, admin_dashboard.DB_DEFAULT_COLUMNS, "timestamp", True), 20)
+    results["dashboard_queue_page"] = measure(page({"status": "Open"}, ticket_store.VIEW_COLUMNS["queue"]), 20)
+    filtered = {"urgency": ["High", "Critical"], "since": "2025-02-01", "until": "2025-02-08"}
+    results["dashboard_db_page_filtered"] = measure(page(filtered, admin_dashboard.DB_DEFAULT_COLUMNS, "timestamp", True), 20)
+
+    # Ticket append with the incident view subscribed, as in the app
+    extra = iter(generate_tickets(repeat, seed + 2))
+    def append():
+        ticket = next(extra)
+        ticket["ticket_id"] += "-B"
+        store.insert(ticket)
+    results["ticket_append"] = measure(append, repeat)
+    results["dashboard_poll_after_append"] = measure(lambda: admin_dashboard.live_summary(store))
+
+    # Frame memory: all-string columns (old) against typed and per-view pruned frames
+    for row in ticket_store.memory_report(store):
+        results[f"frame_mb[{row['frame']}]"] = row["bytes"] / 2**20
+
+    for name in os.listdir(workdir):
+        if name.startswith(os.path.basename(path)): os.remove(os.path.join(workdir, name))
+    return results
+
+def bench_classifier(seed, repeat):
+    # Does not depend on the number of stored tickets, so it runs once per suite
+    texts = [t["raw_issue"] for t in generate_tickets(repeat, seed)]
+    model = mock_brain.MockModel("benchmark", latency=mock_brain.LatencyProfile.zero())
+    prompts = iter([triage.build_prompt(t, incident_view.HEALTHY_CONTEXT) for t in texts])
+    raw = iter(texts)
+    scored = iter(texts)
+    return {
+        "rule_engine_classify": measure(lambda: rule_engine.classify(next(raw)), repeat),
+        "rule_engine_classify_scored": measure(lambda: rule_engine.classify_scored(next(scored)), repeat),
+        "mock_brain_generate": measure(lambda: model.generate_content(next(prompts)), repeat),
+    }
+
+
+# --- REPORTING ---
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare(current, baseline, threshold):
+    regressions = []
+    for scale, benches in current["results"].items():
+        for name, stats in benches.items():
+            old = baseline.get("results", {}).get(scale, {}).get(name)
+            if not isinstance(stats, dict) or not isinstance(old, dict) or not old.get("p50_ms"): continue
+            change = stats["p50_ms"] / old["p50_ms"] - 1
+            if change > threshold: regressions.append((scale, name, old["p50_ms"], stats["p50_ms"], change))
+    return regressions
+
+def run(args):
+    scales = [(label.strip(), parse_scale(label)) for label in args.scales.split(",") if label.strip()]
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(), "backend": args.backend, "seed": args.seed, "repeat": args.repeat,
+            "python": platform.python_version(), "platform": platform.platform(),
+        },
+        "results": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="nexus_bench_")
+    try:
+        report["results"]["classifier"] = bench_classifier(args.seed, args.repeat)
+        for label, count in scales:
+            print(f"== {label} tickets ({args.backend})", flush=True)
+            report["results"][label] = bench_scale(count, args.backend, args.seed, workdir, args.repeat)
+            for name, stats in report["results"][label].items():
+                if isinstance(stats, dict): print(f"  {name:<30} p50 {stats['p50_ms']:9.3f} ms   p95 {stats['p95_ms']:9.3f} ms")
+                else: print(f"  {name:<30} {stats:,.3f}" if isinstance(stats, float) else f"  {name:<30} {stats:,}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    out = args.out or os.path.join(DEFAULT_RESULTS_DIR, f"bench_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f: json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for scale, name, old, new, change in regressions:
+            print(f"REGRESSION {scale}/{name}: p50 {old:.3f} ms -> {new:.3f} ms (+{change:.0%})")
+        if regressions: sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark NexusAgent hot paths on synthetic tickets")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated ticket counts, e.g. 10k,100k,1M")
+    parser.add_argument("--backend", choices=["sqlite", "csv"], default="sqlite")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=200, help="samples per micro-benchmark")
+    parser.add_argument("--out", help="JSON output path (default bench_results/bench_<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown before flagging (0.2 = 20%%)")
+    run(parser.parse_args())
@@ -0,0 +1,218 @@
+import re
+import time
+import operator
+import itertools
+import hashlib
+import logging
+import threading
+import ticket_store
+
+# ==========================================
+# NEAR-DUPLICATE INDEX (MINHASH + LSH)
+# ==========================================
+# Open tickets' raw_issue and summary texts are MinHashed into LSH buckets.
+# A new report only compares against the handful of tickets that share a
+# bucket, so a lookup stays well under a millisecond however many tickets
+# are open. During an outage one bucket fills with near-identical reports, so
+# each bucket contributes at most MAX_BUCKET_CANDIDATES of them, and scoring
+# stops at the first obvious duplicate. Kept current from the store's change
+# events: added on create, dropped once the ticket is resolved.
+#
+# The first build, and the rebuild every RESYNC_SECONDS that picks up writes
+# from other processes, run as background jobs (jobs.py). Until the first
+# build is done, lookups report no duplicate; a query that finds the index
+# stale only schedules the rebuild and answers from the current index.
+# Signatures are computed outside the lock, and change events that arrive
+# meanwhile are replayed onto the rebuilt index.
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+# Estimated Jaccard similarity needed to flag a duplicate, and the (higher)
+# score at which triage.py links the report without asking the model at all.
+DUPLICATE_THRESHOLD = 0.6
+OBVIOUS_DUPLICATE_THRESHOLD = 0.85
+# Writes from other processes are picked up by a background rebuild this often
+RESYNC_SECONDS = 300
+# Tickets scored per matching bucket (near-identical reports share every bucket)
+MAX_BUCKET_CANDIDATES = 8
+
+INDEXED_FIELDS = ["raw_issue", "summary"]
+STOPWORDS = {"a", "an", "the", "is", "are", "am", "was", "my", "our", "i", "we", "it", "its", "to", "of", "in", "on",
+             "and", "or", "for", "with", "at", "this", "that", "me", "please", "help", "again", "still"}
+
+logger = logging.getLogger(__name__)
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+
+def _hash_params():
+    params = []
+    for i in range(NUM_PERM):
+        digest = hashlib.blake2b(f"nexus-minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little") % _PRIME or 1
+        b = int.from_bytes(digest[8:], "little") % _PRIME
+        params.append((a, b))
+    return params
+
+_PARAMS = _hash_params()
+
+
+def tokenize(text):
+    text = text.replace("[Image Attached]", "").lower()
+    words = [w for w in re.findall(r"[a-z0-9']+", text) if w not in STOPWORDS]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+def minhash(tokens):
+    hashed = [int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little") for t in tokens]
+    return tuple(min((a * h + b) % _PRIME for h in hashed) & _MASK for a, b in _PARAMS)
+
+def _bands(signature):
+    return [(i, signature[i * ROWS_PER_BAND:(i + 1) * ROWS_PER_BAND]) for i in range(BANDS)]
+
+def _signatures(ticket):
+    signatures = []
+    for field in INDEXED_FIELDS:
+        tokens = tokenize(str(ticket.get(field) or ""))
+        if tokens: signatures.append((field, minhash(tokens)))
+    return signatures
+
+
+class DuplicateMatch:
+    def __init__(self, ticket_id, parent_ticket_id, score):
+        self.ticket_id = ticket_id
+        self.parent_ticket_id = parent_ticket_id
+        self.score = score
+
+    @property
+    def is_obvious(self):
+        return self.score >= OBVIOUS_DUPLICATE_THRESHOLD
+
+
+class DuplicateIndex:
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.docs = {}
+        self.parents = {}
+        self.synced_at = 0
+        self.ready = False
+        self.resyncing = False
+        # Change events seen while a rebuild is indexing its snapshot (None when not rebuilding)
+        self.pending = None
+        self.stats = {"queries": 0, "matches": 0, "query_seconds": 0.0}
+        store.subscribe(self._on_change)
+        self._schedule_resync()
+
+    def rebuild(self):
+        with self.lock: self.pending = []
+        try:
+            rows = self.store.tickets_with_status(ticket_store.ACTIVE_STATUSES, ["ticket_id", "parent_ticket_id"] + INDEXED_FIELDS)
+            prepared = [(row, _signatures(row)) for row in rows]
+        except Exception:
+            with self.lock: self.pending = None
+            raise
+        with self.lock:
+            self.buckets, self.docs, self.parents = {}, {}, {}
+            for row, signatures in prepared: self._add(row, signatures)
+            for event in self.pending: self._apply(event)
+            self.pending = None
+            self.synced_at = time.monotonic()
+            self.ready = True
+
+    def _schedule_resync(self):
+        with self.lock:
+            # Claimed before the job starts, so concurrent queries schedule one rebuild between them
+            if self.resyncing: return
+            self.resyncing = True
+        import jobs  # here, not at the top: jobs -> triage -> duplicate_index
+        try: jobs.submit("duplicate_resync", self._resync)
+        except jobs.JobsBusy:
+            with self.lock: self.resyncing = False
+
+    def _resync(self, job):
+        try: self.rebuild()
+        except Exception:
+            logger.exception("Duplicate index resync failed; retrying in %s seconds", RESYNC_SECONDS)
+            with self.lock: self.synced_at = time.monotonic()
+        finally:
+            with self.lock: self.resyncing = False
+
+    # --- QUERY ---
+    def find(self, text, threshold=DUPLICATE_THRESHOLD):
+        if time.monotonic() - self.synced_at > RESYNC_SECONDS: self._schedule_resync()
+        if not self.ready: return None
+        started = time.perf_counter()
+        tokens = tokenize(text)
+        if not tokens: return None
+        signature = minhash(tokens)
+        best = None
+        with self.lock:
+            candidates = set()
+            for band in _bands(signature):
+                candidates.update(itertools.islice(self.buckets.get(band, ()), MAX_BUCKET_CANDIDATES))
+            for doc_key in candidates:
+                score = sum(map(operator.eq, signature, self.docs[doc_key])) / NUM_PERM
+                if score >= threshold and (best is None or score > best[1]):
+                    best = (doc_key[0], score)
+                    if score >= OBVIOUS_DUPLICATE_THRESHOLD: break
+            self.stats["queries"] += 1
+            self.stats["query_seconds"] += time.perf_counter() - started
+            if best is None: return None
+            self.stats["matches"] += 1
+            parent = self.parents.get(best[0], best[0])
+            if not any((parent, field) in self.docs for field in INDEXED_FIELDS): parent = best[0]
+            return DuplicateMatch(best[0], parent, best[1])
+
+    # --- MAINTENANCE ---
+    def _on_change(self, event):
+        with self.lock:
+            if self.pending is not None: self.pending.append(event)
+            self._apply(event)
+
+    def _apply(self, event):
+        # Called with self.lock held
+        if event["kind"] == "clear":
+            self.buckets, self.docs, self.parents = {}, {}, {}
+        elif event["kind"] == "insert":
+            for ticket in event["tickets"]:
+                if ticket.get("status") in ticket_store.ACTIVE_STATUSES: self._add(ticket)
+        elif event["kind"] == "update":
+            status = event["fields"].get("status")
+            if status is not None and status not in ticket_store.ACTIVE_STATUSES:
+                self._remove(event["ticket_id"])
+
+    def _add(self, ticket, signatures=None):
+        ticket_id = ticket["ticket_id"]
+        parent = ticket.get("parent_ticket_id")
+        if parent and parent != "N/A": self.parents[ticket_id] = self.parents.get(parent, parent)
+        for field, signature in (_signatures(ticket) if signatures is None else signatures):
+            if (ticket_id, field) in self.docs: continue
+            self.docs[(ticket_id, field)] = signature
+            for band in _bands(signature):
+                self.buckets.setdefault(band, set()).add((ticket_id, field))
+
+    def _remove(self, ticket_id):
+        self.parents.pop(ticket_id, None)
+        for field in INDEXED_FIELDS:
+            signature = self.docs.pop((ticket_id, field), None)
+            if signature is None: continue
+            for band in _bands(signature):
+                bucket = self.buckets.get(band)
+                if bucket is None: continue
+                bucket.discard((ticket_id, field))
+                if not bucket: del self.buckets[band]
+
+    def __len__(self):
+        return len({key[0] for key in self.docs})
+
+
+_index_lock = threading.Lock()
+
+def get_index(store):
+    if getattr(store, "_duplicate_index", None) is None:
+        with _index_lock:
+            if getattr(store, "_duplicate_index", None) is None:
+                store._duplicate_index = DuplicateIndex(store)
+    return store._duplicate_index
@@ -0,0 +1,281 @@
+import os
+import time
+import threading
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+import metrics
+
+# ==========================================
+# SHARED GEMINI CLIENT REGISTRY
+# ==========================================
+# Streamlit re-runs app.py for every message, so building the client there
+# pays the configure/channel setup each time. Clients live here instead, one
+# per (api key, model name) for the whole process, and every session reuses
+# the same underlying connection. Each client keeps its own configuration
+# (key, transport) instead of genai.configure, which is process-global, so two
+# keys in one process do not overwrite each other.
+#
+# .env settings:
+#   GEMINI_MODEL      model name (default gemini-2.0-flash-lite-001)
+#   GEMINI_TIMEOUT    per-request timeout in seconds (default 20)
+#   GEMINI_TRANSPORT  "grpc" (default, one long-lived HTTP/2 channel) or "rest"
+#   GEMINI_STREAM     "1" (default) streams replies to the chat UI, "0" waits for the whole reply
+#   GEMINI_MOCK       "1" answers with mock_brain.MockModel (MOCK_LATENCY / MOCK_ERROR_RATE) inside
+#                     the same ModelClient, so load tests exercise the breaker, limiter and timings
+#                     without a key or network
+#
+# Every call goes through one process-wide circuit breaker and token bucket:
+#   - after GEMINI_BREAKER_FAILURES consecutive failures the breaker opens, and
+#     calls fail at once with ModelUnavailable (triage then uses the local
+#     rules) instead of each waiting out GEMINI_TIMEOUT. After
+#     GEMINI_BREAKER_COOLDOWN seconds one probe call is let through
+#     (half-open). Its success closes the breaker, its failure re-opens it.
+#   - the bucket refills at GEMINI_RATE_PER_MINUTE (match the API quota).
+#     Callers queue for a token for up to GEMINI_RATE_MAX_WAIT seconds, and
+#     only then give up with ModelUnavailable, instead of all getting 429s.
+#
+#   GEMINI_BREAKER_FAILURES  consecutive failures that open the breaker (default 3, 0 = never)
+#   GEMINI_BREAKER_COOLDOWN  seconds the breaker stays open before a probe (default 30)
+#   GEMINI_RATE_PER_MINUTE   requests per minute (default 30, 0 = unlimited)
+#   GEMINI_RATE_BURST        requests allowed back to back when the bucket is full (default 5)
+#   GEMINI_RATE_MAX_WAIT     seconds a call may queue for a token (default 5)
+
+DEFAULT_MODEL = "gemini-2.0-flash-lite-001"
+DEFAULT_TIMEOUT = 20.0
+DEFAULT_BREAKER_FAILURES = 3
+DEFAULT_BREAKER_COOLDOWN = 30.0
+DEFAULT_RATE_PER_MINUTE = 30.0
+DEFAULT_RATE_BURST = 5
+DEFAULT_RATE_MAX_WAIT = 5.0
+MOCK_API_KEY = "mock"
+
+
+# Raised without calling the API: the breaker is open, or no rate-limit token came free in time
+class ModelUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    STATES = ["closed", "half-open", "open"]
+
+    def __init__(self, failures=DEFAULT_BREAKER_FAILURES, cooldown=DEFAULT_BREAKER_COOLDOWN):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allow(self):
+        with self.lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown: return False
+                self.state, self.probing = "half-open", False
+            if self.state == "half-open":
+                # One probe at a time; everyone else keeps using the fallback
+                if self.probing: return False
+                self.probing = True
+            return True
+
+    def release(self):
+        # An allowed call that never reached the API (e.g. rate limited)
+        with self.lock: self.probing = False
+
+    def record(self, ok):
+        with self.lock:
+            self.probing = False
+            if ok:
+                self.state, self.failures = "closed", 0
+                return
+            self.failures += 1
+            if self.state == "half-open" or (self.max_failures and self.failures >= self.max_failures):
+                if self.state != "open": metrics.inc("model_breaker_opened_total")
+                self.state, self.opened_at = "open", time.monotonic()
+
+    def summary(self):
+        with self.lock:
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at)) if self.state == "open" else 0.0
+            return {"state": self.state, "failures": self.failures, "retry_in": retry_in}
+
+
+class TokenBucket:
+    def __init__(self, per_minute=DEFAULT_RATE_PER_MINUTE, burst=DEFAULT_RATE_BURST, max_wait=DEFAULT_RATE_MAX_WAIT):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.waiting = 0
+
+    def acquire(self):
+        # Returns the seconds waited, or None if the wait would exceed max_wait.
+        # A token is reserved up front (the balance may go negative), so callers
+        # are served in arrival order without polling.
+        if not self.rate: return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > self.max_wait: return None
+            self.tokens -= 1
+            if wait: self.waiting += 1
+        if wait:
+            try: time.sleep(wait)
+            finally:
+                with self.lock: self.waiting -= 1
+        return wait
+
+    def summary(self):
+        with self.lock:
+            tokens = min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+            return {"per_minute": self.rate * 60, "tokens": max(0.0, tokens), "capacity": self.capacity, "waiting": self.waiting}
+
+
+_breaker = None
+_limiter = None
+_guard_lock = threading.Lock()
+
+def get_breaker():
+    global _breaker
+    if _breaker is None:
+        with _guard_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(int(os.getenv("GEMINI_BREAKER_FAILURES", DEFAULT_BREAKER_FAILURES)),
+                                          float(os.getenv("GEMINI_BREAKER_COOLDOWN", DEFAULT_BREAKER_COOLDOWN)))
+                metrics.set_gauge("model_breaker_state", lambda: CircuitBreaker.STATES.index(_breaker.state))
+    return _breaker
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _guard_lock:
+            if _limiter is None:
+                _limiter = TokenBucket(float(os.getenv("GEMINI_RATE_PER_MINUTE", DEFAULT_RATE_PER_MINUTE)),
+                                       int(os.getenv("GEMINI_RATE_BURST", DEFAULT_RATE_BURST)),
+                                       float(os.getenv("GEMINI_RATE_MAX_WAIT", DEFAULT_RATE_MAX_WAIT)))
+                metrics.set_gauge("model_rate_waiting", lambda: _limiter.waiting)
+    return _limiter
+
+
+class ModelClient:
+    def __init__(self, api_key, model_name, timeout, transport=None, model=None):
+        # model: a stand-in with the same generate_content (mock_brain.MockModel); no channel is opened
+        started = time.perf_counter()
+        self.model_name = model_name
+        self.timeout = timeout
+        if model is not None:
+            self.model = model
+        else:
+            config = genai_client._ClientManager()
+            config.configure(api_key=api_key, transport=transport or None)
+            self.model = genai.GenerativeModel(model_name)
+            self.model._client = config.get_default_client("generative")
+            # Open the generative channel now with a cheap count_tokens call (the
+            # metadata service has a channel of its own), so the first triage
+            # does not pay the connection setup. No retries: a warm-up that fails
+            # should cost at most one timeout.
+            try: self.model.count_tokens("ping", request_options={"timeout": timeout, "retry": None})
+            except Exception: pass
+        self.connect_seconds = time.perf_counter() - started
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "errors": 0, "generate_seconds": 0.0}
+        self.last_call = None
+
+    def generate_content(self, contents, **kwargs):
+        kwargs.setdefault("request_options", {"timeout": self.timeout})
+        breaker, limiter = get_breaker(), get_limiter()
+        if not breaker.allow():
+            metrics.inc("model_breaker_rejected_total")
+            raise ModelUnavailable("Gemini circuit breaker is open")
+        waited = limiter.acquire()
+        if waited is None:
+            breaker.release()
+            metrics.inc("model_rate_limited_total")
+            raise ModelUnavailable("Gemini rate limit: no request slot within GEMINI_RATE_MAX_WAIT")
+        if waited: metrics.observe("model_rate_wait", waited)
+        with self.lock:
+            # Only the first call on a fresh client pays the connect cost
+            connect = self.connect_seconds if self.stats["calls"] == 0 else 0.0
+            self.stats["calls"] += 1
+        started = time.perf_counter()
+        try:
+            response = self.model.generate_content(contents, **kwargs)
+        except Exception:
+            self._record(started, connect, failed=True)
+            raise
+        if kwargs.get("stream"): return self._timed_stream(response, started, connect)
+        self._record(started, connect)
+        return response
+
+    def _timed_stream(self, response, started, connect):
+        # With stream=True the call returns before the reply is generated; time
+        # the first chunk (what the user waits for) and the full stream separately
+        first_chunk = None
+        failed = False
+        try:
+            for chunk in response:
+                if first_chunk is None: first_chunk = time.perf_counter() - started
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._record(started, connect, failed, first_chunk)
+
+    def _record(self, started, connect, failed=False, first_chunk=None):
+        get_breaker().record(not failed)
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            if failed: self.stats["errors"] += 1
+            self.stats["generate_seconds"] += elapsed
+            self.last_call = {"connect_seconds": connect, "generate_seconds": elapsed,
+                              "first_chunk_seconds": elapsed if first_chunk is None else first_chunk}
+
+    def summary(self):
+        calls = self.stats["calls"]
+        return {
+            "model": self.model_name,
+            "connect_seconds": self.connect_seconds,
+            "calls": calls,
+            "errors": self.stats["errors"],
+            "avg_generate_seconds": self.stats["generate_seconds"] / calls if calls else 0.0,
+            "last_call": self.last_call,
+        }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def mock_enabled():
+    return os.getenv("GEMINI_MOCK", "0") == "1"
+
+def configured_api_key():
+    # With GEMINI_MOCK=1 no real key is needed: calls never leave the process
+    return os.getenv("GEMINI_API_KEY") or (MOCK_API_KEY if mock_enabled() else None)
+
+def get_model(api_key, model_name=None):
+    model_name = model_name or os.getenv("GEMINI_MODEL", DEFAULT_MODEL)
+    key = (api_key, model_name)
+    client = _clients.get(key)
+    if client is None:
+        # Built outside the lock: the warm-up call can take up to GEMINI_TIMEOUT
+        # and must not stall other sessions. If two sessions race, the first
+        # client registered wins and the other is dropped.
+        mock = None
+        if mock_enabled():
+            import mock_brain
+            mock = mock_brain.MockModel(model_name)
+        client = ModelClient(api_key, model_name,
+                             timeout=float(os.getenv("GEMINI_TIMEOUT", DEFAULT_TIMEOUT)),
+                             transport=os.getenv("GEMINI_TRANSPORT"), model=mock)
+        with _clients_lock: client = _clients.setdefault(key, client)
+    return client
+
+def client_stats():
+    return [client.summary() for client in list(_clients.values())]
+
+def guard_stats():
+    return {"breaker": get_breaker().summary(), "limiter": get_limiter().summary()}
@@ -0,0 +1,133 @@
+import bisect
+import threading
+import time
+import ticket_store
+
+# ==========================================
+# ACTIVE INCIDENTS VIEW (MATERIALIZED)
+# ==========================================
+# Open High/Critical tickets, kept current from the store's change events
+# instead of re-reading the table. Readers get a pre-rendered context string,
+# so building the triage prompt costs nothing extra.
+
+ACTIVE_URGENCIES = ("Critical", "High")
+URGENCY_RANK = {"Critical": 0, "High": 1}
+MAX_CONTEXT_INCIDENTS = 15
+# Writes from other processes (ingestion workers, batch jobs) do not reach our
+# listeners, so the view re-reads the store at most this often.
+RESYNC_SECONDS = 30
+HEALTHY_CONTEXT = "None. System is healthy."
+
+
+def _sort_key(incident):
+    # Most urgent first, then oldest first
+    return (URGENCY_RANK.get(incident["urgency"], 9), incident["timestamp"], incident["ticket_id"])
+
+
+class ActiveIncidentView:
+    def __init__(self, store, limit=MAX_CONTEXT_INCIDENTS):
+        self.store = store
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.incidents = {}
+        self.order = []
+        self._top = []
+        self._context = HEALTHY_CONTEXT
+        self.synced_at = 0
+        store.subscribe(self._on_change)
+        self.rebuild()
+
+    def rebuild(self):
+        rows = self.store.active_incidents(ACTIVE_URGENCIES)
+        with self.lock:
+            self.incidents = {}
+            for row in rows:
+                self.incidents.setdefault(row["ticket_id"], {c: row[c] for c in ticket_store.INCIDENT_COLUMNS})
+            self.order = sorted(_sort_key(i) for i in self.incidents.values())
+            self._render()
+            self.synced_at = time.monotonic()
+
+    # --- READS (constant time) ---
+    def top(self):
+        self._maybe_resync()
+        return self._top
+
+    def context(self):
+        self._maybe_resync()
+        return self._context
+
+    def __len__(self):
+        return len(self.incidents)
+
+    def _maybe_resync(self):
+        if time.monotonic() - self.synced_at > RESYNC_SECONDS:
+            try: self.rebuild()
+            except Exception: pass
+
+    # --- WRITE PATH ---
+    def _on_change(self, event):
+        if event["kind"] == "clear":
+            with self.lock:
+                self.incidents, self.order = {}, []
+                self._render()
+        elif event["kind"] == "insert":
+            with self.lock:
+                changed = False
+                for ticket in event["tickets"]:
+                    if ticket.get("status") == "Open" and ticket.get("urgency") in ACTIVE_URGENCIES:
+                        changed |= self._add(ticket)
+                if changed: self._render()
+        elif event["kind"] == "update":
+            self._apply_update(event["ticket_id"], event["fields"])
+
+    def _apply_update(self, ticket_id, fields):
+        with self.lock:
+            current = self.incidents.get(ticket_id)
+            if current is not None:
+                if fields.get("status", "Open") != "Open" or fields.get("urgency", current["urgency"]) not in ACTIVE_URGENCIES:
+                    self._remove(ticket_id)
+                else:
+                    self._remove(ticket_id)
+                    self._add({**current, **fields})
+                self._render()
+                return
+        # A ticket re-entering the view (e.g. transferred back to Open) needs its row
+        if fields.get("status") == "Open" or fields.get("urgency") in ACTIVE_URGENCIES:
+            row = self.store.get_ticket(ticket_id, columns=["status"] + ticket_store.INCIDENT_COLUMNS)
+            if row and row["status"] == "Open" and row["urgency"] in ACTIVE_URGENCIES:
+                with self.lock:
+                    if self._add(row): self._render()
+
+    def _add(self, ticket):
+        if ticket["ticket_id"] in self.incidents: return False
+        incident = {c: ticket.get(c, "N/A") for c in ticket_store.INCIDENT_COLUMNS}
+        self.incidents[incident["ticket_id"]] = incident
+        bisect.insort(self.order, _sort_key(incident))
+        return True
+
+    def _remove(self, ticket_id):
+        incident = self.incidents.pop(ticket_id, None)
+        if incident is None: return
+        key = _sort_key(incident)
+        pos = bisect.bisect_left(self.order, key)
+        if pos < len(self.order) and self.order[pos] == key: del self.order[pos]
+
+    def _render(self):
+        self._top = [self.incidents[key[2]] for key in self.order[:self.limit]]
+        if not self._top:
+            self._context = HEALTHY_CONTEXT
+            return
+        lines = [f"- [{i['ticket_id']}] {i['urgency']}: {i['summary']} ({i['department']})" for i in self._top]
+        hidden = len(self.order) - len(self._top)
+        if hidden > 0: lines.append(f"- ... and {hidden} more active incidents")
+        self._context = "\n".join(lines)
+
+
+_view_lock = threading.Lock()
+
+def get_view(store):
+    if getattr(store, "_incident_view", None) is None:
+        with _view_lock:
+            if getattr(store, "_incident_view", None) is None:
+                store._incident_view = ActiveIncidentView(store)
+    return store._incident_view
@@ -0,0 +1,397 @@
+import os
+import re
+import sys
+import json
+import time
+import email
+import asyncio
+import sqlite3
+import argparse
+import threading
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from email import policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+import triage
+import gemini_client
+import metrics
+
+# ==========================================
+# HEADLESS MULTI-CHANNEL INGESTION
+# ==========================================
+# Channel adapters (file drop, webhook, SMTP stand-ins) push raw messages into
+# a durable SQLite queue. A pool of asyncio workers drains it through the same
+# triage pipeline as the chat UI (triage.triage_message), so tickets land in
+# the ticket store exactly as if they had been typed into app.py.
+#
+#   python ingestion.py --workers 16 --inbox inbox --webhook-port 8081 --smtp-port 2525
+#
+# File drop:  inbox/<channel>/*.txt | *.json | *.eml
+# Webhook:    POST /ingest/<channel>  body: {"from": "...", "text": "..."} or plain text
+# SMTP:       any client; MAIL FROM is the contact, Subject + body is the issue
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUEUE_PATH = os.path.join(BASE_DIR, "ingest_queue.sqlite")
+
+CHANNELS = {"web": "Web Portal", "email": "Email", "whatsapp": "WhatsApp", "slack": "Slack"}
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_PENDING = 10000
+MAX_ATTEMPTS = 3
+# Messages stuck in "processing" this long (worker crashed) go back to pending
+STALE_CLAIM_SECONDS = 300
+POLL_SECONDS = 0.2
+THROUGHPUT_WINDOW_SECONDS = 60
+
+
+def channel_label(name):
+    return CHANNELS.get(name.lower(), name)
+
+class QueueFull(Exception):
+    pass
+
+# A JSON message that is not {"text": "...", "from": "..."}
+class BadMessage(ValueError):
+    pass
+
+
+# ==========================================
+# DURABLE QUEUE
+# ==========================================
+
+class IngestQueue:
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_pending=DEFAULT_MAX_PENDING):
+        self.path = path
+        self.max_pending = max_pending
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT, sender TEXT, body TEXT,
+            received_at REAL, status TEXT DEFAULT 'pending', attempts INTEGER DEFAULT 0,
+            claimed_at REAL, ticket_id TEXT, error TEXT)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_status ON messages (status, id)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def depth(self):
+        return self._conn().execute("SELECT COUNT(*) FROM messages WHERE status IN ('pending', 'processing')").fetchone()[0]
+
+    def push(self, channel, body, sender=None):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.max_pending and conn.execute("SELECT COUNT(*) FROM messages WHERE status = 'pending'").fetchone()[0] >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} messages already pending")
+            cur = conn.execute("INSERT INTO messages (channel, sender, body, received_at) VALUES (?, ?, ?, ?)",
+                               (channel, sender or f"{channel.lower()}-gateway", body, time.time()))
+            conn.execute("COMMIT")
+            return cur.lastrowid
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id, channel, sender, body, received_at, attempts FROM messages "
+                               "WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row:
+                conn.execute("UPDATE messages SET status = 'processing', claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                             (time.time(), row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None: return None
+        return dict(zip(["id", "channel", "sender", "body", "received_at", "attempts"], row))
+
+    def ack(self, message_id, ticket_id=None):
+        self._conn().execute("UPDATE messages SET status = 'done', ticket_id = ? WHERE id = ?", (ticket_id, message_id))
+
+    def fail(self, message_id, error, attempts):
+        status = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+        self._conn().execute("UPDATE messages SET status = ?, error = ? WHERE id = ?", (status, str(error)[:500], message_id))
+
+    def requeue_stale(self):
+        cur = self._conn().execute("UPDATE messages SET status = 'pending' WHERE status = 'processing' AND claimed_at < ?",
+                                   (time.time() - STALE_CLAIM_SECONDS,))
+        return cur.rowcount
+
+
+# ==========================================
+# METRICS (PER CHANNEL)
+# ==========================================
+
+class IngestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: {"enqueued": 0, "rejected": 0, "processed": 0, "failed": 0, "latency_seconds": 0.0})
+        self.recent = defaultdict(deque)
+
+    def record(self, channel, event, latency=None):
+        with self.lock:
+            self.counters[channel][event] += 1
+            if event == "processed":
+                if latency is not None: self.counters[channel]["latency_seconds"] += latency
+                window = self.recent[channel]
+                now = time.monotonic()
+                window.append(now)
+                while window and window[0] < now - THROUGHPUT_WINDOW_SECONDS: window.popleft()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            out = {}
+            for channel, c in self.counters.items():
+                window = self.recent[channel]
+                while window and window[0] < now - THROUGHPUT_WINDOW_SECONDS: window.popleft()
+                out[channel] = {
+                    **{k: v for k, v in c.items() if k != "latency_seconds"},
+                    "per_minute": len(window) * 60 / THROUGHPUT_WINDOW_SECONDS,
+                    "avg_latency_seconds": round(c["latency_seconds"] / c["processed"], 3) if c["processed"] else 0.0,
+                }
+            return out
+
+
+# ==========================================
+# CHANNEL ADAPTERS
+# ==========================================
+
+def _enqueue(queue, ingest_metrics, channel, body, sender=None):
+    try:
+        message_id = queue.push(channel, body, sender)
+        ingest_metrics.record(channel, "enqueued")
+        return message_id
+    except QueueFull:
+        ingest_metrics.record(channel, "rejected")
+        raise
+
+
+def parse_json_message(payload):
+    if not isinstance(payload, dict): raise BadMessage('expected a JSON object like {"text": "...", "from": "..."}')
+    body, sender = payload.get("text", ""), payload.get("from")
+    if not isinstance(body, str): raise BadMessage('"text" must be a string')
+    if sender is not None and not isinstance(sender, str): raise BadMessage('"from" must be a string')
+    return body, sender
+
+def parse_email(raw):
+    msg = email.message_from_bytes(raw if isinstance(raw, bytes) else raw.encode("utf-8"), policy=policy.default)
+    part = msg.get_body(preferencelist=("plain",)) if msg.is_multipart() else msg
+    text = part.get_content() if part is not None else ""
+    subject = msg.get("Subject", "")
+    return (f"{subject}: {text}" if subject else text).strip(), msg.get("From")
+
+
+class FileDropAdapter:
+    # Files stay in place while the queue is full, so a burst simply waits on disk
+    def __init__(self, inbox_dir, queue, ingest_metrics):
+        self.inbox_dir = inbox_dir
+        self.queue = queue
+        self.ingest_metrics = ingest_metrics
+        for name in CHANNELS: os.makedirs(os.path.join(inbox_dir, name), exist_ok=True)
+
+    def _read(self, path):
+        with open(path, "rb") as f: raw = f.read()
+        if path.endswith(".eml"): return parse_email(raw)
+        if path.endswith(".json"):
+            body, sender = parse_json_message(json.loads(raw))
+            return body.strip(), sender
+        return raw.decode("utf-8", errors="replace").strip(), None
+
+    def poll_once(self):
+        moved = 0
+        for name in os.listdir(self.inbox_dir):
+            folder = os.path.join(self.inbox_dir, name)
+            if not os.path.isdir(folder): continue
+            for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+                if not entry.is_file() or not entry.name.endswith((".txt", ".json", ".eml")): continue
+                try:
+                    body, sender = self._read(entry.path)
+                    if body: _enqueue(self.queue, self.ingest_metrics, channel_label(name), body, sender)
+                except QueueFull:
+                    return moved
+                except Exception as e:
+                    print(f"[file-drop] skipping {entry.path}: {e}", file=sys.stderr)
+                    os.replace(entry.path, entry.path + ".bad")
+                    continue
+                os.remove(entry.path)
+                moved += 1
+        return moved
+
+    async def run(self):
+        while True:
+            await asyncio.to_thread(self.poll_once)
+            await asyncio.sleep(1.0)
+
+
+class WebhookAdapter:
+    def __init__(self, host, port, queue, ingest_metrics):
+        queue_, ingest_metrics_ = queue, ingest_metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                match = re.fullmatch(r"/ingest/([\w-]+)/?", self.path)
+                if not match: return self._reply(404, {"error": "use POST /ingest/<channel>"})
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+                try:
+                    body, sender = parse_json_message(json.loads(raw))
+                except BadMessage as e:
+                    return self._reply(400, {"error": str(e)})
+                except ValueError:
+                    body, sender = raw.decode("utf-8", errors="replace"), None
+                if not body.strip(): return self._reply(400, {"error": "empty message"})
+                try:
+                    message_id = _enqueue(queue_, ingest_metrics_, channel_label(match.group(1)), body, sender)
+                except QueueFull:
+                    return self._reply(503, {"error": "queue full"}, {"Retry-After": "5"})
+                self._reply(202, {"id": message_id})
+
+            def _reply(self, code, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items(): self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+class SmtpAdapter:
+    # Minimal SMTP receiver: enough for local relays and test clients (no auth/TLS)
+    def __init__(self, host, port, queue, ingest_metrics):
+        self.host, self.port = host, port
+        self.queue, self.ingest_metrics = queue, ingest_metrics
+
+    async def _session(self, reader, writer):
+        def send(line): writer.write((line + "\r\n").encode())
+        send("220 nexus-ingest ESMTP")
+        sender = None
+        try:
+            while True:
+                line = (await reader.readline()).decode(errors="replace").strip()
+                if not line: break
+                verb = line.split(" ", 1)[0].upper()
+                if verb in ("HELO", "EHLO"): send("250 nexus-ingest")
+                elif verb == "MAIL":
+                    sender = line.partition(":")[2].strip().strip("<>")
+                    send("250 OK")
+                elif verb == "RCPT": send("250 OK")
+                elif verb == "DATA":
+                    send("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    lines = []
+                    while True:
+                        data_line = await reader.readline()
+                        if data_line in (b".\r\n", b".\n", b""): break
+                        lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                    body, header_from = parse_email(b"".join(lines))
+                    try:
+                        await asyncio.to_thread(_enqueue, self.queue, self.ingest_metrics, "Email", body, sender or header_from)
+                        send("250 Queued")
+                    except QueueFull:
+                        send("452 Queue full, try again later")
+                elif verb == "RSET": send("250 OK")
+                elif verb == "NOOP": send("250 OK")
+                elif verb == "QUIT":
+                    send("221 Bye")
+                    break
+                else: send("502 Command not implemented")
+                await writer.drain()
+        finally:
+            await writer.drain()
+            writer.close()
+
+    async def start(self):
+        return await asyncio.start_server(self._session, self.host, self.port)
+
+
+# ==========================================
+# TRIAGE WORKER POOL
+# ==========================================
+
+class WorkerPool:
+    def __init__(self, queue, ingest_metrics, workers=DEFAULT_WORKERS, api_key=None):
+        self.queue = queue
+        self.ingest_metrics = ingest_metrics
+        self.workers = workers
+        self.api_key = api_key
+
+    def _process(self, message):
+        result = triage.triage_message(message["body"], self.api_key, message["channel"], message["sender"])
+        return result.data.get("ticket_id")
+
+    async def _worker(self):
+        while True:
+            message = await asyncio.to_thread(self.queue.claim)
+            if message is None:
+                await asyncio.sleep(POLL_SECONDS)
+                continue
+            try:
+                ticket_id = await asyncio.to_thread(self._process, message)
+                await asyncio.to_thread(self.queue.ack, message["id"], ticket_id)
+                self.ingest_metrics.record(message["channel"], "processed", time.time() - message["received_at"])
+            except Exception as e:
+                await asyncio.to_thread(self.queue.fail, message["id"], e, message["attempts"] + 1)
+                self.ingest_metrics.record(message["channel"], "failed")
+
+    async def run(self):
+        # Each worker holds at most one message, so concurrency is bounded by the pool size
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.workers + 4))
+        await asyncio.gather(*(self._worker() for _ in range(self.workers)))
+
+
+async def report(queue, ingest_metrics, every):
+    while True:
+        await asyncio.sleep(every)
+        depth = await asyncio.to_thread(queue.depth)
+        print(json.dumps({"queue_depth": depth, "channels": ingest_metrics.snapshot()}), flush=True)
+
+
+async def main(args):
+    queue = IngestQueue(args.queue, max_pending=args.max_pending)
+    ingest_metrics = IngestMetrics()
+    requeued = queue.requeue_stale()
+    if requeued: print(f"Re-queued {requeued} stale messages")
+
+    tasks = [WorkerPool(queue, ingest_metrics, args.workers, gemini_client.configured_api_key()).run(),
+             report(queue, ingest_metrics, args.report_every)]
+    if args.inbox: tasks.append(FileDropAdapter(args.inbox, queue, ingest_metrics).run())
+    if args.webhook_port:
+        WebhookAdapter(args.host, args.webhook_port, queue, ingest_metrics).start()
+        print(f"Webhook listening on http://{args.host}:{args.webhook_port}/ingest/<channel>")
+    if args.smtp_port:
+        await SmtpAdapter(args.host, args.smtp_port, queue, ingest_metrics).start()
+        print(f"SMTP listening on {args.host}:{args.smtp_port}")
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Headless NexusAgent ingestion: channel adapters + triage worker pool")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("INGEST_WORKERS", DEFAULT_WORKERS)))
+    parser.add_argument("--max-pending", type=int, default=int(os.getenv("INGEST_MAX_PENDING", DEFAULT_MAX_PENDING)))
+    parser.add_argument("--queue", default=os.getenv("INGEST_QUEUE_PATH", DEFAULT_QUEUE_PATH))
+    parser.add_argument("--inbox", default=None, help="file-drop directory (one sub-folder per channel)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--webhook-port", type=int, default=0)
+    parser.add_argument("--smtp-port", type=int, default=0)
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between metrics lines")
+    metrics.start_file_exporter()
+    try: asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt: pass
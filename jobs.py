@@ -0,0 +1,160 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import attachments
+import transcription
+import triage
+import metrics
+
+# ==========================================
+# BACKGROUND JOBS (OFF THE SCRIPT THREAD)
+# ==========================================
+# Slow per-message work runs on one bounded thread pool shared by every
+# session: voice transcription, attachment preprocessing and triage itself.
+# A Streamlit run only submits the work and keeps the job id. A fragment in
+# app.py then polls get(job_id) for progress, partial fields and the outcome,
+# so the chat page stays responsive while the work runs.
+#
+# Task functions take the Job as their first argument and may call
+# job.update() to report progress or partial results.
+#
+# .env settings:
+#   JOB_WORKERS      threads in the pool (default 8)
+#   JOB_MAX_PENDING  queued + running jobs accepted before submit() refuses (default 256)
+#   JOB_RETENTION    seconds a finished job stays readable (default 600)
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_PENDING = 256
+DEFAULT_RETENTION = 600
+
+
+# Raised by submit() when JOB_MAX_PENDING jobs are already queued or running
+class JobsBusy(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.state = "queued"
+        self.progress = 0.0
+        self.message = "Queued"
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.state in ("done", "failed")
+
+    def update(self, progress=None, message=None, **partial):
+        if progress is not None: self.progress = max(self.progress, min(1.0, progress))
+        if message is not None: self.message = message
+        if partial: self.partial = {**self.partial, **partial}
+
+
+class JobExecutor:
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING, retention=DEFAULT_RETENTION):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.pending = 0
+
+    def submit(self, kind, fn, *args, **kwargs):
+        with self.lock:
+            self._prune()
+            if self.pending >= self.max_pending:
+                metrics.inc("jobs_rejected_total")
+                raise JobsBusy(f"{self.pending} jobs already pending")
+            job = Job(kind)
+            self.jobs[job.id] = job
+            self.pending += 1
+        metrics.inc("jobs_submitted_total")
+        self.pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.state, job.started, job.message = "running", time.time(), "Running"
+        metrics.observe("job_queue_wait", job.started - job.created)
+        try:
+            with metrics.timed(f"job_{job.kind}"):
+                job.result = fn(job, *args, **kwargs)
+            job.progress, job.message, job.state = 1.0, "Done", "done"
+        except Exception as exc:
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.message, job.state = "Failed", "failed"
+            metrics.inc("jobs_failed_total")
+        finally:
+            job.finished = time.time()
+            with self.lock: self.pending -= 1
+
+    def get(self, job_id):
+        with self.lock: return self.jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j.id for j in self.jobs.values() if j.done and j.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def summary(self):
+        with self.lock: states = [job.state for job in self.jobs.values()]
+        return {"workers": self.workers, "pending": self.pending, "running": states.count("running"),
+                "queued": states.count("queued"), "failed": states.count("failed")}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = JobExecutor(int(os.getenv("JOB_WORKERS", DEFAULT_WORKERS)),
+                                        int(os.getenv("JOB_MAX_PENDING", DEFAULT_MAX_PENDING)),
+                                        float(os.getenv("JOB_RETENTION", DEFAULT_RETENTION)))
+                metrics.set_gauge("jobs_pending", lambda: _executor.pending)
+    return _executor
+
+def submit(kind, fn, *args, **kwargs): return get_executor().submit(kind, fn, *args, **kwargs)
+def get(job_id): return get_executor().get(job_id)
+
+
+# --- TASKS ---
+def transcribe_audio(job, audio):
+    job.update(message="Transcribing")
+    text = transcription.get_transcriber().transcribe(audio, on_progress=lambda fraction: job.update(fraction))
+    if not text: raise ValueError("No speech recognized")
+    return text
+
+def prepare_attachment(job, data):
+    job.update(message="Optimizing image")
+    return attachments.get_pipeline().prepare(data)
+
+# Partial fields are what the chat shows while the model is still streaming
+TRIAGE_PROGRESS_FIELDS = ["response", "urgency", "department", "rca_hypothesis", "slack_draft"]
+
+def run_triage(job, user_input, api_key, channel, user_contact, attachment=None, store=None):
+    image, digest = None, None
+    if attachment is not None:
+        # Normally a cache hit: the preview job already prepared these bytes
+        job.update(0.05, "Optimizing image")
+        prepared = attachments.get_pipeline().prepare(attachment)
+        image, digest = prepared.image, prepared.digest
+    job.update(0.1, "Analyzing")
+
+    def on_field(key, value):
+        step = 0.8 / len(TRIAGE_PROGRESS_FIELDS) if key in TRIAGE_PROGRESS_FIELDS else 0.0
+        job.update(job.progress + step, **{key: value})
+
+    return triage.triage_message(user_input, api_key, channel, user_contact, image=image,
+                                 attachment_digest=digest, store=store, on_field=on_field)
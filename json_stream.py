@@ -0,0 +1,95 @@
+import json
+
+# ==========================================
+# INCREMENTAL JSON PARSER (STREAMED TRIAGE)
+# ==========================================
+# The model streams its triage JSON a few tokens at a time. Feeding each chunk
+# here returns the top-level fields that became complete in that chunk, so the
+# chat UI can show "response" long before "status" (the last field) arrives.
+# Markdown fences and any chatter before the opening brace are skipped.
+# Nested values are returned once their closing bracket has arrived.
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_DELIMITERS = ",}]" + _WHITESPACE
+_INCOMPLETE = object()
+
+
+class IncrementalJSONParser:
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"
+        self.key = None
+        self.fields = {}
+
+    @property
+    def done(self):
+        return self.state == "done"
+
+    @property
+    def failed(self):
+        return self.state == "error"
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        completed = []
+        while self.state not in ("done", "error"):
+            if self.state == "start":
+                start = self.buffer.find("{", self.pos)
+                if start < 0:
+                    self.pos = len(self.buffer)
+                    break
+                self.pos = start + 1
+                self.state = "key"
+                continue
+
+            self._skip_whitespace()
+            if self.pos >= len(self.buffer): break
+            char = self.buffer[self.pos]
+
+            if self.state == "key":
+                if char == "}": self._finish()
+                elif char == '"':
+                    key = self._decode()
+                    if key is _INCOMPLETE: break
+                    self.key, self.state = key, "colon"
+                else: self.state = "error"
+
+            elif self.state == "colon":
+                if char == ":":
+                    self.pos += 1
+                    self.state = "value"
+                else: self.state = "error"
+
+            elif self.state == "value":
+                value = self._decode()
+                if value is _INCOMPLETE: break
+                self.fields[self.key] = value
+                completed.append((self.key, value))
+                self.state = "next"
+
+            elif self.state == "next":
+                if char == ",":
+                    self.pos += 1
+                    self.state = "key"
+                elif char == "}": self._finish()
+                else: self.state = "error"
+        return completed
+
+    def _skip_whitespace(self):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+            self.pos += 1
+
+    def _decode(self):
+        try: value, end = _decoder.raw_decode(self.buffer, self.pos)
+        except ValueError: return _INCOMPLETE
+        # A number may still be growing ("12" -> "12.5"), so it waits for the delimiter after it
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if end >= len(self.buffer) or self.buffer[end] not in _DELIMITERS: return _INCOMPLETE
+        self.pos = end
+        return value
+
+    def _finish(self):
+        self.pos += 1
+        self.state = "done"
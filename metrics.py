@@ -0,0 +1,176 @@
+import os
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import ContextDecorator
+
+# ==========================================
+# STAGE TIMINGS & COUNTERS
+# ==========================================
+# In-process metrics for the triage and dashboard hot paths. Wrap a stage with
+# `with metrics.timed("model_call"):` (or use it as a decorator) to record its
+# latency; bump counters with metrics.inc(). The "⏱ Performance" tab in
+# admin_dashboard.py reads them, and prometheus_text() renders the Prometheus
+# text format for a scraper.
+#
+# Percentiles come from each stage's most recent RECENT_SAMPLES timings, so
+# they track current behaviour; the exported buckets/sum/count are cumulative.
+#
+# .env settings:
+#   METRICS_EXPORT_PATH      write the Prometheus text file here (textfile-collector style)
+#   METRICS_EXPORT_INTERVAL  seconds between writes (default 15)
+
+PREFIX = "nexus"
+RECENT_SAMPLES = 1024
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_EXPORT_INTERVAL = 15.0
+
+# Shown in this order in the Performance tab (other stages follow)
+PIPELINE_STAGES = ["duplicate_lookup", "incident_context", "prompt_build", "model_call", "model_first_chunk", "parse",
+                   "ticket_save", "triage_total", "dashboard_prep"]
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None: histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1):
+        with self.lock: self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        # value may be a number or a zero-argument callable evaluated on read
+        with self.lock: self.gauges[name] = value
+
+    def stage_summary(self):
+        with self.lock: items = [(stage, h, sorted(h.recent)) for stage, h in self.histograms.items()]
+        order = {stage: i for i, stage in enumerate(PIPELINE_STAGES)}
+        rows = []
+        for stage, h, ordered in sorted(items, key=lambda item: (order.get(item[0], len(order)), item[0])):
+            rows.append({"stage": stage, "count": h.count, "p50_ms": _percentile(ordered, 0.50) * 1000,
+                         "p95_ms": _percentile(ordered, 0.95) * 1000, "p99_ms": _percentile(ordered, 0.99) * 1000,
+                         "max_ms": h.max * 1000, "total_s": h.sum})
+        return rows
+
+    def counter_values(self):
+        with self.lock: return dict(self.counters)
+
+    def gauge_values(self):
+        with self.lock: gauges = dict(self.gauges)
+        values = {}
+        for name, value in gauges.items():
+            try: values[name] = value() if callable(value) else value
+            except Exception: continue
+        return values
+
+    def prometheus_text(self):
+        lines = []
+        with self.lock:
+            histograms = {stage: (list(h.counts), h.sum, h.count) for stage, h in self.histograms.items()}
+        if histograms:
+            name = f"{PREFIX}_stage_seconds"
+            lines += [f"# HELP {name} Time spent per pipeline stage.", f"# TYPE {name} histogram"]
+            for stage, (counts, total, count) in sorted(histograms.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS, counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {total:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+        for counter, value in sorted(self.counter_values().items()):
+            lines += [f"# TYPE {PREFIX}_{counter} counter", f"{PREFIX}_{counter} {value}"]
+        for gauge, value in sorted(self.gauge_values().items()):
+            lines += [f"# TYPE {PREFIX}_{gauge} gauge", f"{PREFIX}_{gauge} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+REGISTRY = Registry()
+
+
+class timed(ContextDecorator):
+    def __init__(self, stage, registry=REGISTRY):
+        self.stage = stage
+        self.registry = registry
+
+    def _recreate_cm(self):
+        # Fresh instance per decorated call, so concurrent calls don't share a start time
+        return timed(self.stage, self.registry)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        self.registry.observe(self.stage, self.seconds)
+        return False
+
+
+def observe(stage, seconds): REGISTRY.observe(stage, seconds)
+def inc(name, amount=1): REGISTRY.inc(name, amount)
+def set_gauge(name, value): REGISTRY.set_gauge(name, value)
+def stage_summary(): return REGISTRY.stage_summary()
+def counter_values(): return REGISTRY.counter_values()
+def gauge_values(): return REGISTRY.gauge_values()
+def prometheus_text(): return REGISTRY.prometheus_text()
+
+
+# --- FILE EXPORT (for a textfile collector / scraper sidecar) ---
+def write_prometheus(path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f: f.write(prometheus_text())
+    os.replace(tmp, path)
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+def start_file_exporter(path=None, interval=None):
+    global _exporter
+    path = path or os.getenv("METRICS_EXPORT_PATH")
+    if not path: return None
+    interval = interval or float(os.getenv("METRICS_EXPORT_INTERVAL", DEFAULT_EXPORT_INTERVAL))
+    with _exporter_lock:
+        if _exporter is not None: return _exporter
+        def loop():
+            while True:
+                try: write_prometheus(path)
+                except OSError: pass
+                time.sleep(interval)
+        _exporter = threading.Thread(target=loop, name="metrics-exporter", daemon=True)
+        _exporter.start()
+    return _exporter
@@ -1,21 +1,136 @@
+import os
+import re
 import time
+import math
 import random
 import json
+import asyncio
+import rule_engine
+
+# ==========================================
+# LATENCY PROFILES (for local runs & load tests)
+# ==========================================
+# MOCK_LATENCY in .env picks the default profile:
+#   "zero"                    -> answer instantly
+#   "fixed:1.0"               -> always 1.0s (the old behaviour, used when unset)
+#   "dist:p50=0.8,p99=4.0"    -> log-normal with the given p50/p99 in seconds
+# MOCK_ERROR_RATE (0.0-1.0) makes that fraction of calls fail like a 503.
+
+Z_99 = 2.3263  # standard normal quantile for p99
+
+class MockAPIError(Exception):
+    pass
+
+class LatencyProfile:
+    def __init__(self, mode="fixed", seconds=1.0, p50=None, p99=None, error_rate=0.0, seed=None):
+        self.mode = mode
+        self.seconds = seconds
+        self.p50 = p50
+        self.p99 = p99
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        if mode == "dist":
+            # Log-normal: median = exp(mu), p99 = exp(mu + Z_99 * sigma)
+            self.mu = math.log(p50)
+            self.sigma = max(0.0, math.log(p99 / p50) / Z_99)
+
+    @classmethod
+    def zero(cls, error_rate=0.0, seed=None):
+        return cls("zero", 0.0, error_rate=error_rate, seed=seed)
+
+    @classmethod
+    def fixed(cls, seconds, error_rate=0.0, seed=None):
+        return cls("fixed", seconds, error_rate=error_rate, seed=seed)
+
+    @classmethod
+    def distribution(cls, p50, p99, error_rate=0.0, seed=None):
+        return cls("dist", p50=p50, p99=p99, error_rate=error_rate, seed=seed)
+
+    @classmethod
+    def from_env(cls):
+        spec = os.getenv("MOCK_LATENCY", "fixed:1.0").strip().lower()
+        error_rate = float(os.getenv("MOCK_ERROR_RATE", "0") or 0)
+        kind, _, args = spec.partition(":")
+        if kind == "zero": return cls.zero(error_rate)
+        if kind == "dist":
+            params = dict(part.split("=") for part in args.split(",") if "=" in part)
+            return cls.distribution(float(params.get("p50", 1.0)), float(params.get("p99", 3.0)), error_rate)
+        return cls.fixed(float(args or 1.0), error_rate)
+
+    def sample(self):
+        if self.mode == "zero": return 0.0
+        if self.mode == "dist": return self.rng.lognormvariate(self.mu, self.sigma)
+        return self.seconds
+
+    def should_fail(self):
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+
+# ==========================================
+# MOCK MODEL
+# ==========================================
 
 class MockResponse:
     def __init__(self, text):
         self.text = text
 
+# stream=True yields the JSON in chunks of this many characters, with the
+# sampled latency spread across them (like tokens arriving from the API)
+STREAM_CHUNK_CHARS = 24
+# triage.build_prompt quotes the message as  User Input: "<message>"  followed by
+# the Context line. Only that part is classified: the rest of the prompt lists
+# "Fire, Smoke, Sparks" and would make every reply a fire hazard.
+USER_INPUT = re.compile(r'User Input: "(.*)"\s*\n\s*Context:', re.DOTALL)
+FIELD_ORDER = ["is_duplicate", "department", "urgency", "summary", "rca_hypothesis", "response", "slack_draft", "sentiment", "status"]
+
+class MockStreamResponse:
+    def __init__(self, text, delay):
+        self.text = text
+        self.chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+        self.delay = delay
+
+    def __iter__(self):
+        pause = self.delay / len(self.chunks) if self.chunks else 0.0
+        for chunk in self.chunks:
+            if pause: time.sleep(pause)
+            yield MockResponse(chunk)
+
 class MockModel:
-    def __init__(self, model_name):
+    def __init__(self, model_name, latency=None):
         self.model_name = model_name
+        self.latency = latency or LatencyProfile.from_env()
 
-    def generate_content(self, prompt):
+    def generate_content(self, contents, stream=False, **kwargs):
         # Fake "Thinking" time
-        time.sleep(1.0)
-        
-        prompt_lower = prompt.lower()
-        
+        delay = self.latency.sample()
+        if stream:
+            # A failing call still costs the wait before the error arrives
+            if self.latency.should_fail():
+                if delay: time.sleep(delay)
+                raise MockAPIError("503 Service Unavailable (simulated)")
+            return MockStreamResponse(self._reply(contents).text, delay)
+        if delay: time.sleep(delay)
+        return self._respond(contents)
+
+    async def generate_content_async(self, contents, **kwargs):
+        delay = self.latency.sample()
+        if delay: await asyncio.sleep(delay)
+        return self._respond(contents)
+
+    def _respond(self, contents):
+        if self.latency.should_fail():
+            raise MockAPIError("503 Service Unavailable (simulated)")
+        return self._reply(contents)
+
+    def _reply(self, contents):
+        # Same call shapes as the real client: a prompt string or a [prompt, image, ...] list
+        if isinstance(contents, (list, tuple)):
+            prompt = " ".join(part for part in contents if isinstance(part, str))
+        else:
+            prompt = contents
+        match = USER_INPUT.search(prompt)
+        if match: prompt = match.group(1)
+
         # --- BASE TEMPLATE ---
         base_data = {
             "is_duplicate": False,
@@ -26,56 +141,10 @@ class MockModel:
         }
 
         # --- LOGIC ---
-        
-        # 1. CRITICAL: Fire, Smoke, Water, Smell
-        if any(x in prompt_lower for x in ["fire", "smoke", "smell", "burn", "water", "leak", "spark"]):
-            specific_data = {
-                "summary": "Hardware Fire Hazard", 
-                "urgency": "Critical", 
-                "department": "Hardware", 
-                "response": "EVACUATE AREA. Fire safety protocols initiated.", 
-                "sentiment": "Panic",
-                "rca_hypothesis": "Thermal Runaway in Server Rack",
-                "slack_draft": "🚨 CRITICAL: Safety hazard detected. Evacuation ordered."
-            }
-            
-        # 2. MEDIUM: Whatsapp, Zoom, Wifi, Slow, Internet, Connect, Down, Glitch, Loading
-        elif any(x in prompt_lower for x in ["whatsapp", "zoom", "slack", "wifi", "slow", "internet", "connect", "down", "glitch", "loading", "medium", "latency"]):
-            specific_data = {
-                "summary": "Service Degradation", 
-                "urgency": "Medium", 
-                "department": "Network", 
-                "response": "Performance degradation detected. Clearing cache and resetting connection.", 
-                "sentiment": "Frustrated",
-                "rca_hypothesis": "Application/Network Congestion",
-                "slack_draft": "⚠️ Network warning: App latency reported."
-            }
-            
-        # 3. HIGH: Crash, Blue Screen, Broken, Boot, Won't Start, NOT WORKING, DEAD
-        # <--- ADDED "NOT WORKING" HERE
-        elif any(x in prompt_lower for x in ["crash", "blue screen", "broken", "won't start", "boot", "fail", "not working", "dead", "stopped"]):
-            specific_data = {
-                "summary": "Hardware Failure", 
-                "urgency": "High", 
-                "department": "Hardware", 
-                "response": "Critical hardware error. Technician dispatched.", 
-                "sentiment": "Angry",
-                "rca_hypothesis": "Disk/Motherboard Failure",
-                "slack_draft": "❌ Hardware failure reported. Replacement required."
-            }
-            
-        # 4. LOW: Everything else
-        else:
-            specific_data = {
-                "summary": "General Inquiry", 
-                "urgency": "Low", 
-                "department": "Support", 
-                "response": "Ticket created. A technician will review shortly.", 
-                "sentiment": "Neutral",
-                "rca_hypothesis": "User Information Request",
-                "slack_draft": "Info: Low priority ticket created."
-            }
-
-        # MERGE
+        # Keyword rules live in rule_engine.RULES (shared with the app.py fallback)
+        specific_data = rule_engine.classify(prompt)
+
+        # MERGE (in the prompt's field order, so a streamed reply reaches "response" as early as the real one)
         final_data = {**base_data, **specific_data}
+        final_data = {key: final_data[key] for key in sorted(final_data, key=lambda k: FIELD_ORDER.index(k) if k in FIELD_ORDER else len(FIELD_ORDER))}
         return MockResponse(json.dumps(final_data))
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dotenv import load_dotenv
+import ticket_store
+import rule_engine
+import triage
+import triage_schema
+import gemini_client
+
+# ==========================================
+# BATCH RE-CLASSIFICATION OF HISTORICAL TICKETS
+# ==========================================
+# Re-triages stored tickets after the keyword rules (rule_engine.py) or the
+# prompt (triage.py) change, without replaying them through the UI.
+#
+#   python reclassify.py --engine rules --workers 8
+#   python reclassify.py --engine model --workers 4 --rate 2 --status Open
+#   python reclassify.py --resume            # continue after an interruption
+#
+# raw_issue is streamed from the ticket store in batches. Rules run in a
+# process pool; model calls run in a rate-limited thread pool. Each batch's
+# urgency/department/sentiment is written back in one transaction, and the
+# checkpoint file then records the last committed row. The checkpoint never
+# moves past a row whose classification failed, so --resume retries it.
+#
+# Model calls share gemini_client's process-wide token bucket and circuit
+# breaker, so --rate is capped at GEMINI_RATE_PER_MINUTE. A call the breaker
+# or bucket refuses (ModelUnavailable) is retried with backoff instead of
+# counting the row as failed.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHECKPOINT = os.path.join(BASE_DIR, "reclassify_checkpoint.json")
+RECLASSIFIED_FIELDS = ["urgency", "department", "sentiment"]
+IMAGE_MARKER = " [Image Attached]"
+MODEL_RETRIES = 6
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+
+
+# --- LOCAL RULES (process pool) ---
+def classify_rules(raw_issues):
+    return [rule_engine.classify(text.replace(IMAGE_MARKER, "")) for text in raw_issues]
+
+
+# --- MODEL (rate-limited thread pool) ---
+class RateLimiter:
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval: return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now: time.sleep(slot - now)
+
+def classify_model(text, model, limiter):
+    for attempt in range(MODEL_RETRIES + 1):
+        limiter.wait()
+        try:
+            response = model.generate_content(triage.build_prompt(text.replace(IMAGE_MARKER, ""), triage.get_active_incidents_context()),
+                                              generation_config=triage_schema.GENERATION_CONFIG)
+            return triage.parse_triage(response.text)
+        except gemini_client.ModelUnavailable:
+            # Rate limited or breaker open: not this row's fault, so wait (at least until the breaker's probe) and retry
+            if attempt == MODEL_RETRIES: return None
+            retry_in = gemini_client.get_breaker().summary()["retry_in"]
+            time.sleep(min(RETRY_MAX_SECONDS, max(retry_in, RETRY_BASE_SECONDS * 2 ** attempt)))
+        except Exception:
+            return None
+
+def model_rate(requested):
+    # Never ask for more than the shared bucket refills, or most calls would be refused
+    shared = gemini_client.get_limiter().rate
+    return min(requested, shared) if shared and requested > 0 else (shared or requested)
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path): return {"last_row_id": 0, "updated": 0, "failed": 0}
+    with open(path) as f: return json.load(f)
+
+def save_checkpoint(path, checkpoint):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f: json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def run(args):
+    store = ticket_store.get_store()
+    checkpoint = load_checkpoint(args.checkpoint) if args.resume else {"last_row_id": 0, "updated": 0, "failed": 0}
+    checkpoint["engine"] = args.engine
+    # Every failure of an earlier run lies after its checkpoint and is retried now
+    checkpoint["failed"] = 0
+    statuses = args.status or None
+
+    if args.engine == "model":
+        api_key = gemini_client.configured_api_key()
+        if not api_key: sys.exit("GEMINI_API_KEY (or GEMINI_MOCK=1) is required for --engine model")
+        model = gemini_client.get_model(api_key)
+        rate = model_rate(args.rate)
+        if rate < args.rate: print(f"--rate {args.rate}/s capped at the shared GEMINI_RATE_PER_MINUTE ({rate * 60:.0f}/min)")
+        limiter = RateLimiter(rate)
+        pool = ThreadPoolExecutor(max_workers=args.workers)
+    else:
+        pool = ProcessPoolExecutor(max_workers=args.workers)
+
+    started = time.perf_counter()
+    processed = 0
+    held = None
+    with pool:
+        for batch in store.iter_batches(["ticket_id", "raw_issue"] + RECLASSIFIED_FIELDS, args.batch_size,
+                                        after_row=checkpoint["last_row_id"], statuses=statuses):
+            texts = [row["raw_issue"] for row in batch]
+            if args.engine == "model":
+                results = list(pool.map(lambda text: classify_model(text, model, limiter), texts))
+            else:
+                # Slice the batch across the processes; each task classifies a whole slice
+                step = max(1, len(texts) // (args.workers * 4))
+                results = [r for part in pool.map(classify_rules, [texts[i:i + step] for i in range(0, len(texts), step)]) for r in part]
+
+            updates = []
+            first_failed = None
+            for row, result in zip(batch, results):
+                if result is None:
+                    checkpoint["failed"] += 1
+                    if first_failed is None: first_failed = row["row_id"]
+                    continue
+                if result.get("status") != "Open": continue
+                new_fields = {f: result[f] for f in RECLASSIFIED_FIELDS if f in result}
+                if any(str(row[f]) != str(v) for f, v in new_fields.items()):
+                    updates.append({"row_id": row["row_id"], "ticket_id": row["ticket_id"], **new_fields})
+
+            if not args.dry_run: checkpoint["updated"] += store.update_rows(updates)
+            else: checkpoint["updated"] += len(updates)
+            if held is None and first_failed is not None:
+                held = max([checkpoint["last_row_id"]] + [row["row_id"] for row in batch if row["row_id"] < first_failed])
+            checkpoint["last_row_id"] = batch[-1]["row_id"] if held is None else held
+            if not args.dry_run: save_checkpoint(args.checkpoint, checkpoint)
+
+            processed += len(batch)
+            elapsed = time.perf_counter() - started
+            print(f"rows={processed} changed={checkpoint['updated']} failed={checkpoint['failed']} "
+                  f"last_row={checkpoint['last_row_id']} rate={processed / elapsed:,.0f} rows/sec", flush=True)
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {processed} rows in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:,.0f} rows/sec), "
+          f"{checkpoint['updated']} changed, {checkpoint['failed']} failed")
+    if held is not None: print(f"Checkpoint held at row {held} (before the first failure); --resume retries from there")
+    return checkpoint
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Re-triage stored tickets in bulk")
+    parser.add_argument("--engine", choices=["rules", "model"], default="rules")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--rate", type=float, default=2.0, help="max model requests per second (--engine model; capped at GEMINI_RATE_PER_MINUTE)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--status", action="append", help="only tickets with this status (repeatable)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--resume", action="store_true", help="continue from the last committed row in --checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="classify and report, but write nothing")
+    run(parser.parse_args())
@@ -0,0 +1,119 @@
+import os
+import csv
+import sys
+import json
+import argparse
+from dotenv import load_dotenv
+import rule_engine
+import ticket_store
+
+# ==========================================
+# TIERED TRIAGE ROUTER (RULES FIRST, MODEL WHEN AMBIGUOUS)
+# ==========================================
+# Every message is scored by the local keyword rules first
+# (rule_engine.classify_scored). When the rules are confident (a safety
+# hazard, a password reset, a too-short spam message), triage.py answers with
+# their result in microseconds. Everything else (no keyword at all, weak
+# keywords, or keywords of competing rules) escalates to the model. Messages
+# with an attachment always escalate: the rules cannot see the image.
+#
+# Offline evaluation replays labeled tickets through the router and reports,
+# per threshold, how many model calls would be avoided and how often the local
+# answer agrees with the label:
+#
+#   python router.py --evaluate                                  # tickets in the store
+#   python router.py --evaluate router_eval.jsonl                # the bundled cases
+#   python router.py --evaluate labeled.jsonl --thresholds 0.5,0.7,0.85,0.95
+#
+# router_eval.jsonl holds the known hard cases: real hazards next to
+# look-alikes ("Firewall", "Spark job", "memory leak", "water cooler") that
+# must reach the model instead of getting an evacuation notice.
+#
+# A labeled file is JSONL or CSV with "text" (or "raw_issue"), "urgency" and
+# optionally "department". Stored tickets are only meaningful labels when they
+# were triaged by the model or corrected by an agent.
+#
+# .env settings:
+#   ROUTER_THRESHOLD  rule confidence at or above which the rules answer (default 0.85; above 1 always asks the model)
+# Per-rule confidences can be set with "confidence" in TRIAGE_RULES_FILE.
+
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_EVAL_THRESHOLDS = "0.5,0.6,0.7,0.8,0.85,0.9,0.95"
+IMAGE_MARKER = " [Image Attached]"
+
+
+class Route:
+    def __init__(self, result, confidence, rule, local):
+        self.result = result
+        self.confidence = confidence
+        self.rule = rule
+        self.local = local
+
+
+def current_threshold():
+    return float(os.getenv("ROUTER_THRESHOLD", DEFAULT_THRESHOLD))
+
+def route(text, has_image=False, threshold=None):
+    result, confidence, rule = rule_engine.classify_scored(text)
+    threshold = current_threshold() if threshold is None else threshold
+    return Route(result, confidence, rule, not has_image and confidence >= threshold)
+
+
+# --- OFFLINE EVALUATION ---
+def load_labeled(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f)) if path.lower().endswith(".csv") else [json.loads(line) for line in f if line.strip()]
+    return [{"text": row.get("text") or row.get("raw_issue") or "", "urgency": row.get("urgency") or None,
+             "department": row.get("department") or None} for row in rows]
+
+def stored_labeled(store, limit=None):
+    samples = []
+    for batch in store.iter_batches(["raw_issue", "urgency", "department"], 5000):
+        samples += [{"text": row["raw_issue"], "urgency": row["urgency"], "department": row["department"]} for row in batch]
+        if limit and len(samples) >= limit: break
+    return samples[:limit] if limit else samples
+
+def evaluate(samples, thresholds):
+    # Scores each sample once; every threshold then only re-counts
+    scored = []
+    for sample in samples:
+        text = sample["text"]
+        result, confidence, rule = rule_engine.classify_scored(text.replace(IMAGE_MARKER, ""))
+        scored.append((IMAGE_MARKER in text, confidence, sample, result))
+    report = []
+    for threshold in thresholds:
+        local = [(sample, result) for has_image, confidence, sample, result in scored
+                 if not has_image and confidence >= threshold]
+        # Spam has no urgency to compare; it agrees only when the label is not a ticket either
+        urgency = sum(1 for sample, result in local if result.get("urgency") == sample["urgency"])
+        both = sum(1 for sample, result in local if result.get("urgency") == sample["urgency"]
+                   and (not sample["department"] or result.get("department") == sample["department"]))
+        report.append({"threshold": threshold, "samples": len(scored), "local": len(local),
+                       "escalated": len(scored) - len(local),
+                       "avoided_rate": len(local) / len(scored) if scored else 0.0,
+                       "urgency_agreement": urgency / len(local) if local else None,
+                       "agreement": both / len(local) if local else None})
+    return report
+
+
+def _pct(value):
+    return "–" if value is None else f"{value:.1%}"
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Tiered triage router: offline evaluation")
+    parser.add_argument("--evaluate", nargs="?", const="store", metavar="LABELED_FILE",
+                        help="replay labeled tickets (JSONL/CSV file, default: the ticket store)")
+    parser.add_argument("--thresholds", default=DEFAULT_EVAL_THRESHOLDS, help="comma-separated thresholds to compare")
+    parser.add_argument("--limit", type=int, help="replay at most this many tickets")
+    args = parser.parse_args()
+    if not args.evaluate: parser.error("nothing to do (use --evaluate)")
+
+    samples = stored_labeled(ticket_store.get_store(), args.limit) if args.evaluate == "store" else load_labeled(args.evaluate)[:args.limit]
+    if not samples: sys.exit("No labeled tickets to replay")
+    thresholds = [float(t) for t in args.thresholds.split(",") if t.strip()]
+    print(f"Replayed {len(samples):,} labeled tickets (current ROUTER_THRESHOLD {current_threshold()})")
+    print(f"{'threshold':>9}  {'local':>8}  {'API calls avoided':>17}  {'urgency agrees':>14}  {'urgency+dept agree':>18}")
+    for row in evaluate(samples, thresholds):
+        print(f"{row['threshold']:>9.2f}  {row['local']:>8,}  {_pct(row['avoided_rate']):>17}  "
+              f"{_pct(row['urgency_agreement']):>14}  {_pct(row['agreement']):>18}")
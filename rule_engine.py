@@ -0,0 +1,237 @@
+import os
+import json
+from collections import deque
+
+# ==========================================
+# LOCAL TRIAGE RULES (SINGLE SOURCE OF TRUTH)
+# ==========================================
+# Used by mock_brain.MockModel, by the simulation fallback in app.py and by
+# the tiered router (router.py).
+# Rules are checked in list order: the first rule with a keyword hit wins.
+# Keywords match whole words ("fire" does not hit "Firewall"), optionally
+# followed by one of INFLECTIONS ("fires", "leaking", "crashed").
+# Site-specific keywords/rules can be layered on top with TRIAGE_RULES_FILE
+# (a JSON list in the same shape; an entry with an existing "name" extends
+# that rule's keywords).
+#
+# classify_scored() also returns a confidence in [0, 1], used by router.py to
+# decide whether the rules can answer without asking the model. A rule's
+# "confidence" is how far a single keyword hit can be trusted; each further
+# hit on the same rule adds a little, and a hit on any other rule as well
+# (e.g. "laptop" and "password") marks the message as ambiguous. Only
+# unambiguous words get a confidence above the router threshold: "leak" or
+# "spark" are as often a memory leak or an Apache Spark job as a hazard, so
+# they live in possible_hazard, which the router escalates to the model.
+
+RULES = [
+    {
+        "name": "safety_hazard", "confidence": 0.95,
+        "keywords": ["fire", "on fire", "smoke", "smoking", "flames"],
+        "department": "Hardware", "urgency": "Critical", "sentiment": "Panic",
+        "summary": "Fire Hazard",
+        "rca_hypothesis": "Potential Thermal Runaway",
+        "response": "CRITICAL: Evacuate immediately. Fire safety team dispatched.",
+        "slack_draft": "🚨 FIRE DETECTED.",
+    },
+    {
+        "name": "possible_hazard", "confidence": 0.5,
+        "keywords": ["smell", "burning", "burnt", "water", "leak", "spark", "overheating"],
+        "department": "Hardware", "urgency": "High", "sentiment": "Frustrated",
+        "summary": "Possible Physical Hazard",
+        "rca_hypothesis": "Reported leak, overheating or burning smell near equipment.",
+        "response": "I have alerted the hardware team to check the equipment. If you see smoke or fire, leave the area.",
+        "slack_draft": "⚠️ POSSIBLE HAZARD: Equipment check requested.",
+    },
+    {
+        "name": "service_degradation", "confidence": 0.6,
+        "keywords": ["whatsapp", "zoom", "slack", "wifi", "slow", "internet", "connect", "connection", "disconnect", "down", "glitch", "loading", "medium", "latency"],
+        "department": "Network", "urgency": "Medium", "sentiment": "Frustrated",
+        "summary": "Service Degradation",
+        "rca_hypothesis": "Application/Network Congestion",
+        "response": "Performance degradation detected. Clearing cache and resetting connection.",
+        "slack_draft": "⚠️ Network warning: App latency reported.",
+    },
+    {
+        "name": "hardware_failure", "confidence": 0.7,
+        "keywords": ["laptop", "screen", "computer", "crash", "blue screen", "broken", "won't start", "won't turn on", "boot", "fail", "not working", "dead", "stopped"],
+        "department": "Hardware", "urgency": "High", "sentiment": "Frustrated",
+        "summary": "Hardware Malfunction",
+        "rca_hypothesis": "User reported critical device failure.",
+        "response": "I have logged a High Priority hardware ticket. A technician will review your device status shortly.",
+        "slack_draft": "🚨 HARDWARE FAILURE: User unable to work.",
+    },
+    {
+        "name": "access_request", "confidence": 0.9,
+        "keywords": ["password", "locked out", "account locked", "access to", "permission"],
+        "department": "Access", "urgency": "Low", "sentiment": "Neutral",
+        "summary": "Access Request",
+        "rca_hypothesis": "Credential or permission change requested.",
+        "response": "I've logged your access request. The access team will follow up shortly.",
+        "slack_draft": "🔑 Access request logged.",
+    },
+]
+
+DEFAULT_RULE = {
+    "name": "general_inquiry",
+    "department": "General", "urgency": "Low", "sentiment": "Neutral",
+    "summary": "General Inquiry",
+    "rca_hypothesis": "User reported issue.",
+    "response": "Ticket created. A support agent will check this shortly.",
+    "slack_draft": "Info: New ticket logged.",
+}
+
+# Inputs shorter than this (after stripping) are treated as spam/incomplete
+MIN_INPUT_CHARS = 4
+SPAM_RESULT = {"status": "Ignored", "response": "Please provide a detailed issue.", "sentiment": "Neutral"}
+
+# Confidence of a keyword rule without its own "confidence", of the catch-all
+# DEFAULT_RULE (nothing matched: always worth asking the model), and of spam
+DEFAULT_CONFIDENCE = 0.6
+# Word endings a keyword may carry and still match
+INFLECTIONS = ("s", "es", "ed", "ing")
+NO_MATCH_CONFIDENCE = 0.0
+SPAM_CONFIDENCE = 1.0
+EXTRA_HIT_BONUS = 0.05
+MAX_EXTRA_HITS = 2
+CONFLICT_FACTOR = 0.5
+
+TICKET_FIELDS = ["department", "urgency", "summary", "rca_hypothesis", "response", "slack_draft", "sentiment"]
+
+
+# ==========================================
+# COMPILED MATCHER (AHO-CORASICK)
+# ==========================================
+# All keywords of all rules go into one automaton, so classification is a
+# single pass over the input whatever the number of keywords.
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+def bounded(text, start, end):
+    # text[start:end] is a whole word, or a word plus one of INFLECTIONS
+    if start > 0 and _is_word_char(text[start - 1]): return False
+    if end >= len(text) or not _is_word_char(text[end]): return True
+    for suffix in INFLECTIONS:
+        stop = end + len(suffix)
+        if text.startswith(suffix, end) and (stop >= len(text) or not _is_word_char(text[stop])): return True
+    return False
+
+
+class KeywordAutomaton:
+    def __init__(self, keywords):
+        # keywords: iterable of (keyword, rule_index)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]
+        for keyword, rule_index in keywords:
+            node = 0
+            for ch in keyword:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(set())
+                node = nxt
+            self.out[node].add((rule_index, len(keyword)))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]: f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] |= self.out[self.fail[nxt]]
+
+    def best_match(self, text):
+        # Lowest rule index hit anywhere in text; stops early on rule 0
+        goto, fail, out = self.goto, self.fail, self.out
+        best = None
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]: node = fail[node]
+            node = goto[node].get(ch, 0)
+            for hit, length in out[node]:
+                if (best is None or hit < best) and bounded(text, i + 1 - length, i + 1): best = hit
+            if best == 0: break
+        return best
+
+    def hit_counts(self, text):
+        # Keyword hits per rule index over the whole text
+        goto, fail, out = self.goto, self.fail, self.out
+        counts = {}
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]: node = fail[node]
+            node = goto[node].get(ch, 0)
+            for hit, length in out[node]:
+                if bounded(text, i + 1 - length, i + 1): counts[hit] = counts.get(hit, 0) + 1
+        return counts
+
+
+class RuleEngine:
+    def __init__(self, rules=RULES, default_rule=DEFAULT_RULE):
+        self.rules = rules
+        self.default_rule = default_rule
+        self.automaton = KeywordAutomaton(
+            (kw.lower(), i) for i, rule in enumerate(rules) for kw in rule["keywords"] if kw)
+
+    def match(self, text):
+        hit = self.automaton.best_match(text.lower())
+        return self.rules[hit] if hit is not None else None
+
+    def _result(self, rule):
+        result = {field: rule[field] for field in TICKET_FIELDS}
+        result.update({"status": "Open", "is_duplicate": False})
+        return result
+
+    def classify(self, text):
+        rule = self.match(text)
+        if rule is None:
+            if len(text.strip()) < MIN_INPUT_CHARS: return dict(SPAM_RESULT)
+            rule = self.default_rule
+        return self._result(rule)
+
+    def classify_scored(self, text):
+        # Same result as classify(), plus (confidence, rule name)
+        counts = self.automaton.hit_counts(text.lower())
+        if not counts:
+            if len(text.strip()) < MIN_INPUT_CHARS: return dict(SPAM_RESULT), SPAM_CONFIDENCE, "spam"
+            return self._result(self.default_rule), NO_MATCH_CONFIDENCE, self.default_rule["name"]
+        best = min(counts)
+        rule = self.rules[best]
+        confidence = rule.get("confidence", DEFAULT_CONFIDENCE) + EXTRA_HIT_BONUS * min(counts[best] - 1, MAX_EXTRA_HITS)
+        if len(counts) > 1: confidence *= CONFLICT_FACTOR
+        return self._result(rule), min(1.0, confidence), rule["name"]
+
+
+def load_rules(path, base=RULES):
+    rules = [dict(rule, keywords=list(rule["keywords"])) for rule in base]
+    by_name = {rule["name"]: rule for rule in rules}
+    with open(path, encoding="utf-8") as f:
+        extra = json.load(f)
+    for rule in extra:
+        if rule.get("name") in by_name:
+            by_name[rule["name"]]["keywords"].extend(rule.get("keywords", []))
+        else:
+            rules.append({**DEFAULT_RULE, **rule})
+    return rules
+
+
+_engine = None
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        rules_file = os.getenv("TRIAGE_RULES_FILE")
+        _engine = RuleEngine(load_rules(rules_file) if rules_file else RULES)
+    return _engine
+
+def classify(text):
+    return get_engine().classify(text)
+
+def classify_scored(text):
+    return get_engine().classify_scored(text)
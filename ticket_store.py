@@ -0,0 +1,902 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+import io
+import bisect
+import pandas as pd
+import metrics
+
+# ==========================================
+# TICKET STORAGE LAYER
+# ==========================================
+# Every read and write of tickets goes through get_store(). The backend is
+# picked with TICKET_STORE in .env ("sqlite" by default, "csv" for the
+# legacy append-only file).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LEGACY_CSV_PATH = os.path.join(BASE_DIR, "ticket_db.csv")
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, "ticket_db.sqlite")
+
+COLUMNS = ["ticket_id", "timestamp", "channel", "user_contact", "status", "urgency", "department", "summary", "raw_issue", "response", "sentiment", "is_duplicate", "rca_hypothesis", "slack_draft", "parent_ticket_id"]
+INDEXED_COLUMNS = ["ticket_id", "status", "urgency", "department", "timestamp"]
+CARD_COLUMNS = ["ticket_id", "status", "department", "summary"]
+INCIDENT_COLUMNS = ["ticket_id", "timestamp", "urgency", "department", "summary"]
+ACTIVE_STATUSES = ("Open", "In Progress")
+# Dimensions of the rollup counters; "hour" is the timestamp truncated to "YYYY-MM-DD HH"
+ROLLUP_DIMENSIONS = ["status", "urgency", "department", "channel", "hour"]
+
+MIGRATE_CHUNK_ROWS = 50000
+TAIL_FINGERPRINT_BYTES = 64
+
+
+def normalize_ticket_id(query):
+    query = query.upper().strip()
+    if query and not query.startswith("TKT-"): query = "TKT-" + query
+    return query
+
+def _prefix_upper_bound(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# Table filters: {column: value or list of values, "since": ts, "until": ts}.
+# Empty values are ignored; since is inclusive, until exclusive.
+def _active_filters(filters):
+    active = {}
+    for key, value in (filters or {}).items():
+        if value is None or (isinstance(value, (list, tuple, set)) and not value) or value == "": continue
+        if key not in ("since", "until") and key not in COLUMNS: raise ValueError(f"Unknown filter: {key}")
+        active[key] = list(value) if isinstance(value, (list, tuple, set)) else value
+    return active
+
+def normalize_ticket(ticket_data):
+    row = {}
+    for col in COLUMNS:
+        value = ticket_data.get(col, "N/A")
+        if value is None: value = "N/A"
+        row[col] = str(value)
+    return row
+
+
+# --- TYPED FRAMES ---
+# Frames handed to the dashboard and benchmarks use compact dtypes: the
+# enum-like columns are categoricals (an int8 code per row instead of a Python
+# string), timestamp is a real datetime and is_duplicate a bool. Raw string
+# frames (load_frame) are kept for code that writes rows back verbatim.
+CATEGORY_COLUMNS = ["channel", "status", "urgency", "department", "sentiment"]
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Per-view column pruning: each dashboard view only ever loads these
+VIEW_COLUMNS = {
+    "queue": ["ticket_id", "urgency", "department", "summary", "timestamp"],
+    "workspace": ["ticket_id", "department", "summary", "rca_hypothesis"],
+    "history": ["ticket_id", "timestamp", "summary"],
+    "history_card": ["ticket_id", "timestamp", "summary", "department", "rca_hypothesis", "response"],
+    "database": ["ticket_id", "timestamp", "status", "urgency", "department", "channel", "summary"],
+}
+
+def typed_frame(df):
+    converted = {}
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS: converted[col] = df[col].astype("category")
+        elif col == "timestamp": converted[col] = pd.to_datetime(df[col], format=TIMESTAMP_FORMAT, errors="coerce")
+        elif col == "is_duplicate": converted[col] = df[col].astype(str).str.lower().eq("true")
+    return df.assign(**converted) if converted else df
+
+def concat_typed(frame, tail):
+    # Align category sets first so the categoricals survive the concat
+    # (concatenating mismatched categories silently falls back to object)
+    for col in CATEGORY_COLUMNS:
+        if col not in frame.columns: continue
+        extra = tail[col].cat.categories.difference(frame[col].cat.categories)
+        if len(extra): frame = frame.assign(**{col: frame[col].cat.add_categories(extra)})
+        tail = tail.assign(**{col: tail[col].cat.set_categories(frame[col].cat.categories)})
+    return pd.concat([frame, tail], ignore_index=True)
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+# --- CHANGE EVENTS ---
+# Listeners get a dict after every committed write:
+#   {"kind": "insert", "tickets": [...]}
+#   {"kind": "update", "ticket_id": ..., "fields": {...}}   (claims, resolves, transfers, edits)
+#   {"kind": "clear"}
+# In-memory views subscribe here so they stay current without re-reading the table.
+class StoreEvents:
+    def subscribe(self, listener):
+        if not hasattr(self, "_listeners"): self._listeners = []
+        self._listeners.append(listener)
+
+    def _notify(self, event):
+        for listener in getattr(self, "_listeners", []):
+            try: listener(event)
+            except Exception: pass
+
+
+# --- SQLITE BACKEND (DEFAULT) ---
+class SQLiteTicketStore(StoreEvents):
+    backend = "sqlite"
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        cols = ", ".join(f"{c} TEXT" for c in COLUMNS)
+        with self._conn() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS tickets (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols})")
+            # Columns added after a database was created
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(tickets)")}
+            for col in COLUMNS:
+                if col not in existing: conn.execute(f"ALTER TABLE tickets ADD COLUMN {col} TEXT DEFAULT 'N/A'")
+            for col in INDEXED_COLUMNS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_tickets_{col} ON tickets ({col})")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            # Which archive part file holds each archived ticket (archive.py)
+            conn.execute("CREATE TABLE IF NOT EXISTS archived_tickets (ticket_id TEXT PRIMARY KEY, part TEXT NOT NULL) WITHOUT ROWID")
+            self._init_rollup(conn)
+
+    # --- ROLLUP COUNTERS ---
+    # Ticket counts per status x urgency x department x channel x hour, kept by
+    # triggers inside the same transaction as every insert/update/delete (from
+    # any process). Dashboard metrics and charts read these small tables instead
+    # of scanning tickets: rollup_totals (no hour, a few hundred rows at most)
+    # for the headline numbers, rollup (keyed hour-first) for time ranges.
+    # rebuild_rollup() recomputes both from the base table. Tickets moved to the
+    # cold archive (archive.py) stay counted: archive_rows() records them in
+    # archived_rollup, which the rebuild adds back in.
+    def _init_rollup(self, conn):
+        conn.execute("CREATE TABLE IF NOT EXISTS rollup (hour TEXT, status TEXT, urgency TEXT, department TEXT, channel TEXT, "
+                     "count INTEGER NOT NULL, PRIMARY KEY (hour, status, urgency, department, channel)) WITHOUT ROWID")
+        conn.execute("CREATE TABLE IF NOT EXISTS rollup_totals (status TEXT, urgency TEXT, department TEXT, channel TEXT, "
+                     "count INTEGER NOT NULL, PRIMARY KEY (status, urgency, department, channel)) WITHOUT ROWID")
+        conn.execute("CREATE TABLE IF NOT EXISTS archived_rollup (hour TEXT, status TEXT, urgency TEXT, department TEXT, channel TEXT, "
+                     "count INTEGER NOT NULL, PRIMARY KEY (hour, status, urgency, department, channel)) WITHOUT ROWID")
+        add, remove = "", ""
+        for table, dims in (("rollup", ROLLUP_DIMENSIONS), ("rollup_totals", ROLLUP_DIMENSIONS[:-1])):
+            values = lambda row: [f"substr({row}.timestamp, 1, 13)" if d == "hour" else f"{row}.{d}" for d in dims]
+            match = " AND ".join(f"{d} IS {v}" for d, v in zip(dims, values("OLD")))
+            add += (f"INSERT INTO {table} ({', '.join(dims)}, count) VALUES ({', '.join(values('NEW'))}, 1) "
+                    f"ON CONFLICT ({', '.join(dims)}) DO UPDATE SET count = count + 1; ")
+            remove += f"UPDATE {table} SET count = count - 1 WHERE {match}; DELETE FROM {table} WHERE {match} AND count <= 0; "
+        changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in ["status", "urgency", "department", "channel", "timestamp"])
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_rollup_insert AFTER INSERT ON tickets BEGIN {add} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_rollup_delete AFTER DELETE ON tickets BEGIN {remove} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_rollup_update AFTER UPDATE OF status, urgency, department, channel, timestamp "
+                     f"ON tickets WHEN {changed} BEGIN {remove} {add} END")
+        # Databases created before the rollup existed are backfilled once
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'rollup_built'").fetchone() is None:
+            self._rebuild_rollup(conn)
+
+    def _rebuild_rollup(self, conn):
+        conn.execute("DELETE FROM rollup")
+        conn.execute("DELETE FROM rollup_totals")
+        conn.execute("INSERT INTO rollup SELECT hour, status, urgency, department, channel, SUM(count) FROM ("
+                     "SELECT substr(timestamp, 1, 13) AS hour, status, urgency, department, channel, COUNT(*) AS count "
+                     "FROM tickets GROUP BY 1, 2, 3, 4, 5 UNION ALL SELECT * FROM archived_rollup) GROUP BY 1, 2, 3, 4, 5")
+        conn.execute("INSERT INTO rollup_totals SELECT status, urgency, department, channel, SUM(count) FROM rollup GROUP BY 1, 2, 3, 4")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollup_built', datetime('now'))")
+
+    def rebuild_rollup(self):
+        with self._conn() as conn: self._rebuild_rollup(conn)
+
+    def rollup(self, group_by, since_hour=None, **filters):
+        # e.g. rollup(["urgency"]) or rollup(["hour", "urgency"], since_hour="2025-03-01 09", status="Open")
+        dims = [d for d in group_by if d in ROLLUP_DIMENSIONS]
+        hourly = since_hour is not None or "hour" in dims or "hour" in filters
+        return self._rollup_query("rollup" if hourly else "rollup_totals", dims, since_hour, filters)
+
+    def _rollup_query(self, table, dims, since_hour, filters):
+        where, params = [], []
+        for dim, value in filters.items():
+            if dim not in ROLLUP_DIMENSIONS: raise ValueError(f"Unknown rollup dimension: {dim}")
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            where.append(f"{dim} IN ({', '.join('?' for _ in values)})")
+            params += values
+        if since_hour is not None:
+            where.append("hour >= ?")
+            params.append(since_hour)
+        sql = f"SELECT {', '.join(dims + ['SUM(count)'])} FROM {table}"
+        if where: sql += " WHERE " + " AND ".join(where)
+        if dims: sql += f" GROUP BY {', '.join(dims)} ORDER BY {', '.join(dims)}"
+        return [dict(zip(dims + ["count"], row)) for row in self._conn().execute(sql, params).fetchall() if row[-1]]
+
+    def insert(self, ticket_data):
+        self.insert_many([ticket_data])
+
+    def insert_many(self, tickets):
+        tickets = [normalize_ticket(t) for t in tickets]
+        rows = [tuple(t[c] for c in COLUMNS) for t in tickets]
+        if not rows: return 0
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self._conn() as conn:
+            conn.executemany(f"INSERT INTO tickets ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows)
+        self._notify({"kind": "insert", "tickets": tickets})
+        return len(rows)
+
+    def update(self, ticket_id, **fields):
+        fields = {k: str(v) for k, v in fields.items() if k in COLUMNS and k != "ticket_id"}
+        if not fields: return 0
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._conn() as conn:
+            cur = conn.execute(f"UPDATE tickets SET {assignments} WHERE ticket_id = ?", [*fields.values(), ticket_id])
+            if cur.rowcount: self._bump_update_seq(conn)
+        if cur.rowcount: self._notify({"kind": "update", "ticket_id": ticket_id, "fields": fields})
+        return cur.rowcount
+
+    # Compare-and-set: only moves the ticket if it is still in from_status,
+    # so two agents acting on the same ticket cannot overwrite each other.
+    def transition(self, ticket_id, from_status, to_status, **fields):
+        fields = {k: str(v) for k, v in fields.items() if k in COLUMNS and k not in ("ticket_id", "status")}
+        assignments = ", ".join(["status = ?"] + [f"{k} = ?" for k in fields])
+        with self._conn() as conn:
+            cur = conn.execute(f"UPDATE tickets SET {assignments} WHERE ticket_id = ? AND status = ?",
+                               [to_status, *fields.values(), ticket_id, from_status])
+            if cur.rowcount: self._bump_update_seq(conn)
+        if cur.rowcount: self._notify({"kind": "update", "ticket_id": ticket_id, "fields": {"status": to_status, **fields}})
+        return cur.rowcount > 0
+
+    # Bumped on every in-place change so readers can tell a pure append
+    # (only new ids) from an edit of existing rows.
+    def _bump_update_seq(self, conn):
+        conn.execute("INSERT INTO meta (key, value) VALUES ('update_seq', 1) "
+                     "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    def count(self, status=None):
+        if status is None:
+            return self._conn().execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM tickets WHERE status = ?", (status,)).fetchone()[0]
+
+    # For the ticket_store_rows gauge: read off the rollup (archived tickets
+    # taken back out) instead of counting the table on every export
+    def row_count(self):
+        return self._conn().execute("SELECT (SELECT COALESCE(SUM(count), 0) FROM rollup_totals) "
+                                    "- (SELECT COALESCE(SUM(count), 0) FROM archived_rollup)").fetchone()[0]
+
+    def load_frame(self, columns=None):
+        columns = columns or COLUMNS
+        return pd.read_sql_query(f"SELECT {', '.join(columns)} FROM tickets ORDER BY id", self._conn())
+
+    def active_incidents(self, urgencies=("High", "Critical")):
+        marks = ", ".join("?" for _ in urgencies)
+        cur = self._conn().execute(
+            f"SELECT {', '.join(INCIDENT_COLUMNS)} FROM tickets WHERE status = 'Open' AND urgency IN ({marks}) ORDER BY id",
+            list(urgencies))
+        return [dict(zip(INCIDENT_COLUMNS, row)) for row in cur.fetchall()]
+
+    def tickets_with_status(self, statuses, columns):
+        marks = ", ".join("?" for _ in statuses)
+        cur = self._conn().execute(
+            f"SELECT {', '.join(columns)} FROM tickets WHERE status IN ({marks}) ORDER BY id", list(statuses))
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+    # --- BATCH ACCESS (re-classification jobs) ---
+    # Keyset pagination on the row id, so each batch is an index range scan and
+    # a job can resume from the last row id it committed.
+    def iter_batches(self, columns, batch_size=1000, after_row=0, statuses=None):
+        where, params = "id > ?", [after_row]
+        if statuses:
+            where += f" AND status IN ({', '.join('?' for _ in statuses)})"
+            params += list(statuses)
+        while True:
+            cur = self._conn().execute(
+                f"SELECT id, {', '.join(columns)} FROM tickets WHERE {where} ORDER BY id LIMIT ?", [*params, batch_size])
+            rows = [dict(zip(["row_id"] + columns, row)) for row in cur.fetchall()]
+            if not rows: return
+            yield rows
+            params[0] = rows[-1]["row_id"]
+
+    def update_rows(self, updates):
+        # updates: [{"row_id": ..., "ticket_id": ..., <column>: <value>, ...}] applied in one transaction
+        if not updates: return 0
+        changed = 0
+        with self._conn() as conn:
+            for update in updates:
+                fields = {k: str(v) for k, v in update.items() if k in COLUMNS and k != "ticket_id"}
+                if not fields: continue
+                assignments = ", ".join(f"{k} = ?" for k in fields)
+                changed += conn.execute(f"UPDATE tickets SET {assignments} WHERE id = ?", [*fields.values(), update["row_id"]]).rowcount
+            if changed: self._bump_update_seq(conn)
+        for update in updates:
+            fields = {k: str(v) for k, v in update.items() if k in COLUMNS and k != "ticket_id"}
+            if fields: self._notify({"kind": "update", "ticket_id": update.get("ticket_id"), "fields": fields})
+        return changed
+
+    # --- COLD TIER (archive.py) ---
+    # Deletes rows that have been written to the archive. Their counts are added
+    # to archived_rollup and back onto the rollups in the same transaction, so
+    # dashboard totals keep covering all-time history. parts maps each archived
+    # ticket_id to the part file it was written to, for direct lookups.
+    def archive_rows(self, row_ids, parts=None):
+        if not row_ids: return 0
+        ids = json.dumps([int(i) for i in row_ids])
+        selected = "FROM tickets WHERE id IN (SELECT value FROM json_each(?))"
+        with self._conn() as conn:
+            for table, dims in (("archived_rollup", ROLLUP_DIMENSIONS), ("rollup", ROLLUP_DIMENSIONS), ("rollup_totals", ROLLUP_DIMENSIONS[:-1])):
+                values = ", ".join("substr(timestamp, 1, 13)" if d == "hour" else d for d in dims)
+                groups = ", ".join(str(i + 1) for i in range(len(dims)))
+                conn.execute(f"INSERT INTO {table} ({', '.join(dims)}, count) SELECT {values}, COUNT(*) {selected} GROUP BY {groups} "
+                             f"ON CONFLICT ({', '.join(dims)}) DO UPDATE SET count = count + excluded.count", (ids,))
+            ticket_ids = [row[0] for row in conn.execute(f"SELECT ticket_id {selected}", (ids,))]
+            if parts: conn.executemany("INSERT OR REPLACE INTO archived_tickets (ticket_id, part) VALUES (?, ?)", parts)
+            removed = conn.execute(f"DELETE {selected}", (ids,)).rowcount
+            if removed: self._bump_update_seq(conn)
+        if removed: self._notify({"kind": "archive", "ticket_ids": ticket_ids})
+        return removed
+
+    def archived_part(self, ticket_id):
+        row = self._conn().execute("SELECT part FROM archived_tickets WHERE ticket_id = ?", (ticket_id,)).fetchone()
+        return row[0] if row else None
+
+    def archived_parts(self):
+        return {row[0] for row in self._conn().execute("SELECT DISTINCT part FROM archived_tickets")}
+
+    def index_archived(self, parts):
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO archived_tickets (ticket_id, part) VALUES (?, ?)", parts)
+
+    # --- PAGED TABLE ACCESS (dashboard tables) ---
+    # Filters, sorting and LIMIT/OFFSET run in SQLite, and only the requested
+    # columns of the visible page are materialized.
+    def _filter_sql(self, filters):
+        where, params = [], []
+        active = _active_filters(filters)
+        for key, value in active.items():
+            if key == "since": where.append("timestamp >= ?")
+            elif key == "until": where.append("timestamp < ?")
+            elif isinstance(value, list):
+                where.append(f"{key} IN ({', '.join('?' for _ in value)})")
+                params += value
+                continue
+            else: where.append(f"{key} = ?")
+            params.append(value)
+        if not where: return "", params
+        # Without ANALYZE stats SQLite prefers the low-selectivity urgency/status
+        # indexes over a date range; a bounded range is almost always the narrower one
+        hint = " INDEXED BY idx_tickets_timestamp" if "since" in active or "until" in active else ""
+        return f"{hint} WHERE " + " AND ".join(where), params
+
+    def query_page(self, columns=None, filters=None, sort_by=None, descending=False, offset=0, limit=50):
+        columns = columns or COLUMNS
+        where, params = self._filter_sql(filters)
+        order = sort_by if sort_by in COLUMNS else "id"
+        direction = "DESC" if descending else "ASC"
+        sql = f"SELECT {', '.join(columns)} FROM tickets{where} ORDER BY {order} {direction}, id {direction} LIMIT ? OFFSET ?"
+        return typed_frame(pd.read_sql_query(sql, self._conn(), params=[*params, int(limit), int(offset)]))
+
+    def count_matching(self, filters=None):
+        active = _active_filters(filters)
+        # Filters on rollup dimensions only: answered from the counters
+        # (less whatever archive_rows() moved out of the table)
+        if all(key in ROLLUP_DIMENSIONS[:-1] for key in active):
+            archived = self._rollup_query("archived_rollup", [], None, active)
+            return sum(row["count"] for row in self.rollup([], **active)) - sum(row["count"] for row in archived)
+        where, params = self._filter_sql(active)
+        return self._conn().execute(f"SELECT COUNT(*) FROM tickets{where}", params).fetchone()[0]
+
+    # Both lookups are seeks on idx_tickets_ticket_id; the prefix search is a
+    # range scan over the sorted B-tree, never a table scan.
+    def get_ticket(self, ticket_id, columns=CARD_COLUMNS):
+        row = self._conn().execute(
+            f"SELECT {', '.join(columns)} FROM tickets WHERE ticket_id = ? ORDER BY id LIMIT 1", (ticket_id,)).fetchone()
+        return dict(zip(columns, row)) if row else None
+
+    def find_by_prefix(self, prefix, limit=10, columns=CARD_COLUMNS):
+        if not prefix: return []
+        cur = self._conn().execute(
+            f"SELECT {', '.join(columns)} FROM tickets WHERE ticket_id >= ? AND ticket_id < ? ORDER BY ticket_id LIMIT ?",
+            (prefix, _prefix_upper_bound(prefix), limit))
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+    def clear(self):
+        # Archived counts go too (the archive files are removed by TicketArchive.clear)
+        with self._conn() as conn:
+            conn.execute("DELETE FROM tickets")
+            conn.execute("DELETE FROM archived_rollup")
+            conn.execute("DELETE FROM archived_tickets")
+            self._rebuild_rollup(conn)
+            self._bump_update_seq(conn)
+        self._notify({"kind": "clear"})
+
+    # --- CHANGE FEED ---
+    # Grows on every committed change, from any process: inserts advance the
+    # AUTOINCREMENT sequence (which never goes back, even after deletes) and
+    # every update/delete bumps update_seq. Two primary-key reads, so it is
+    # cheap enough to poll every second from each open dashboard.
+    def version(self):
+        return self._conn().execute(
+            "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'tickets'), 0) + "
+            "COALESCE((SELECT CAST(value AS INTEGER) FROM meta WHERE key = 'update_seq'), 0)").fetchone()[0]
+
+    # --- FRAME CACHE HOOKS ---
+    def _signature(self):
+        sig = []
+        for path in (self.path, self.path + "-wal"):
+            try:
+                st_ = os.stat(path)
+                sig.append((st_.st_size, st_.st_mtime_ns))
+            except FileNotFoundError:
+                sig.append(None)
+        return tuple(sig)
+
+    def _cursor(self):
+        conn = self._conn()
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM tickets").fetchone()[0]
+        return (self.get_meta("update_seq", "0"), max_id)
+
+    def _is_append(self, old, new):
+        return old[0] == new[0] and new[1] >= old[1]
+
+    def _read_since(self, old, new, columns=COLUMNS):
+        return pd.read_sql_query(f"SELECT {', '.join(columns)} FROM tickets WHERE id > ? AND id <= ? ORDER BY id",
+                                 self._conn(), params=(old[1], new[1]))
+
+    def cached_frame(self, columns=None):
+        return _frame_cache_for(self, columns).get()
+
+    def get_meta(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+# --- IN-MEMORY TICKET ID INDEX ---
+# Hash map for exact lookups plus a sorted id list for prefix search.
+class TicketIndex:
+    def __init__(self, cards=()):
+        self.cards = {}
+        self.ids = []
+        for card in cards:
+            if card["ticket_id"] not in self.cards:
+                self.cards[card["ticket_id"]] = {c: card.get(c, "N/A") for c in CARD_COLUMNS}
+        self.ids = sorted(self.cards)
+
+    def add(self, ticket):
+        ticket_id = ticket["ticket_id"]
+        if ticket_id in self.cards: return
+        self.cards[ticket_id] = {c: ticket.get(c, "N/A") for c in CARD_COLUMNS}
+        bisect.insort(self.ids, ticket_id)
+
+    def update(self, ticket_id, fields):
+        card = self.cards.get(ticket_id)
+        if card is None: return
+        for k, v in fields.items():
+            if k in card: card[k] = v
+
+    def get(self, ticket_id):
+        return self.cards.get(ticket_id)
+
+    def find_by_prefix(self, prefix, limit=10):
+        if not prefix: return []
+        start = bisect.bisect_left(self.ids, prefix)
+        end = bisect.bisect_left(self.ids, _prefix_upper_bound(prefix))
+        return [self.cards[i] for i in self.ids[start:min(end, start + limit)]]
+
+
+# --- CSV BACKEND (LEGACY) ---
+class CsvTicketStore(StoreEvents):
+    backend = "csv"
+
+    def __init__(self, path=LEGACY_CSV_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._rewrites = 0
+        self._index = None
+        self._index_sig = None
+        self._rows = None
+        self._rows_sig = None
+        self._upgrade_header()
+
+    # Rewrites an older file once so its header matches COLUMNS
+    def _upgrade_header(self):
+        if not os.path.exists(self.path): return
+        header = pd.read_csv(self.path, nrows=0).columns.tolist()
+        if header == COLUMNS: return
+        df = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+        for col in COLUMNS:
+            if col not in df.columns: df[col] = "N/A"
+        df[COLUMNS].to_csv(self.path, index=False)
+
+    def insert(self, ticket_data):
+        self.insert_many([ticket_data])
+
+    def insert_many(self, tickets):
+        if not tickets: return 0
+        rows = [normalize_ticket(t) for t in tickets]
+        df_new = pd.DataFrame(rows)
+        with self._lock:
+            sig_before = self._signature()
+            if not os.path.exists(self.path): df_new.to_csv(self.path, index=False, columns=COLUMNS)
+            else: df_new.to_csv(self.path, mode='a', header=False, index=False, columns=COLUMNS)
+            self._update_index(sig_before, lambda idx: [idx.add(r) for r in rows])
+            self._update_rows(sig_before, len(rows))
+        self._notify({"kind": "insert", "tickets": rows})
+        return len(df_new)
+
+    def update(self, ticket_id, **fields):
+        fields = {k: str(v) for k, v in fields.items() if k in COLUMNS and k != "ticket_id"}
+        if not fields or not os.path.exists(self.path): return 0
+        with self._lock:
+            sig_before = self._signature()
+            df = self.load_frame()
+            mask = df['ticket_id'] == ticket_id
+            for k, v in fields.items():
+                df.loc[mask, k] = v
+            df.to_csv(self.path, index=False)
+            self._rewrites += 1
+            self._update_index(sig_before, lambda idx: idx.update(ticket_id, fields))
+            self._update_rows(sig_before)
+        if mask.any(): self._notify({"kind": "update", "ticket_id": ticket_id, "fields": fields})
+        return int(mask.sum())
+
+    def transition(self, ticket_id, from_status, to_status, **fields):
+        fields = {k: str(v) for k, v in fields.items() if k in COLUMNS and k not in ("ticket_id", "status")}
+        if not os.path.exists(self.path): return False
+        with self._lock:
+            sig_before = self._signature()
+            df = self.load_frame()
+            mask = (df['ticket_id'] == ticket_id) & (df['status'] == from_status)
+            if not mask.any(): return False
+            df.loc[mask, 'status'] = to_status
+            for k, v in fields.items():
+                df.loc[mask, k] = v
+            df.to_csv(self.path, index=False)
+            self._rewrites += 1
+            self._update_index(sig_before, lambda idx: idx.update(ticket_id, {"status": to_status, **fields}))
+            self._update_rows(sig_before)
+        self._notify({"kind": "update", "ticket_id": ticket_id, "fields": {"status": to_status, **fields}})
+        return True
+
+    def count(self, status=None):
+        df = self.load_frame()
+        return len(df) if status is None else int((df['status'] == status).sum())
+
+    # For the ticket_store_rows gauge: counted once, then kept by our own writes
+    # like the ticket index; a write from another process forces a recount
+    def row_count(self):
+        with self._lock:
+            sig = self._signature()
+            if self._rows is None or self._rows_sig != sig:
+                self._rows = self.count()
+                self._rows_sig = sig
+            return self._rows
+
+    def _update_rows(self, sig_before, added=0):
+        if self._rows is None: return
+        if self._rows_sig != sig_before:
+            self._rows = None
+            return
+        self._rows += added
+        self._rows_sig = self._signature()
+
+    def load_frame(self, columns=None):
+        columns = columns or COLUMNS
+        if not os.path.exists(self.path): return pd.DataFrame(columns=columns)
+        return pd.read_csv(self.path, usecols=columns, dtype=str, keep_default_na=False)[columns]
+
+    def active_incidents(self, urgencies=("High", "Critical")):
+        df = self.load_frame(["status"] + INCIDENT_COLUMNS)
+        active_df = df[(df['status'] == 'Open') & (df['urgency'].isin(urgencies))]
+        return active_df[INCIDENT_COLUMNS].to_dict("records")
+
+    def tickets_with_status(self, statuses, columns):
+        df = self.load_frame(sorted(set(columns) | {"status"}, key=COLUMNS.index))
+        return df[df['status'].isin(statuses)][columns].to_dict("records")
+
+    # --- BATCH ACCESS (re-classification jobs) ---
+    # row_id is the 1-based data line number in the file
+    def iter_batches(self, columns, batch_size=1000, after_row=0, statuses=None):
+        if not os.path.exists(self.path): return
+        wanted = sorted(set(columns) | {"status"}, key=COLUMNS.index)
+        offset = 0
+        for chunk in pd.read_csv(self.path, usecols=wanted, dtype=str, keep_default_na=False, chunksize=batch_size):
+            chunk = chunk.assign(row_id=range(offset + 1, offset + len(chunk) + 1))
+            offset += len(chunk)
+            chunk = chunk[chunk["row_id"] > after_row]
+            if statuses: chunk = chunk[chunk["status"].isin(statuses)]
+            if not chunk.empty: yield chunk[["row_id"] + columns].to_dict("records")
+
+    def update_rows(self, updates):
+        if not updates or not os.path.exists(self.path): return 0
+        with self._lock:
+            df = self.load_frame()
+            for update in updates:
+                for k, v in update.items():
+                    if k in COLUMNS and k != "ticket_id": df.at[update["row_id"] - 1, k] = str(v)
+            df.to_csv(self.path, index=False)
+            self._rewrites += 1
+            self._index = None
+            self._rows = None
+        for update in updates:
+            fields = {k: str(v) for k, v in update.items() if k in COLUMNS and k != "ticket_id"}
+            if fields: self._notify({"kind": "update", "ticket_id": update.get("ticket_id"), "fields": fields})
+        return len(updates)
+
+    # --- ROLLUP COUNTERS ---
+    # The CSV has nowhere to keep counters transactionally, so they are grouped
+    # from the cached frame (one pass per change of the file).
+    def rollup(self, group_by, since_hour=None, **filters):
+        df = self.cached_frame(["timestamp", "status", "urgency", "department", "channel"])
+        if df.empty: return []
+        df = df.assign(hour=df["timestamp"].dt.strftime("%Y-%m-%d %H"))
+        for dim, value in filters.items():
+            if dim not in ROLLUP_DIMENSIONS: raise ValueError(f"Unknown rollup dimension: {dim}")
+            df = df[df[dim].isin(list(value) if isinstance(value, (list, tuple, set)) else [value])]
+        if since_hour is not None: df = df[df["hour"] >= since_hour]
+        dims = [d for d in group_by if d in ROLLUP_DIMENSIONS]
+        if not dims: return [{"count": len(df)}] if len(df) else []
+        counts = df.groupby(dims, observed=True).size().reset_index(name="count")
+        return counts.sort_values(dims).to_dict("records")
+
+    def rebuild_rollup(self):
+        pass
+
+    # --- PAGED TABLE ACCESS ---
+    def _filtered(self, filters):
+        df = self.cached_frame()
+        for key, value in _active_filters(filters).items():
+            if key == "since": df = df[df["timestamp"] >= value]
+            elif key == "until": df = df[df["timestamp"] < value]
+            elif isinstance(value, list): df = df[df[key].isin(value)]
+            else: df = df[df[key] == value]
+        return df
+
+    def query_page(self, columns=None, filters=None, sort_by=None, descending=False, offset=0, limit=50):
+        df = self._filtered(filters)
+        if sort_by in COLUMNS:
+            # Categories sort in category order, so order on the string values like SQLite does
+            # (reversed first, so ties come out newest-first on a descending sort)
+            key = (lambda col: col.astype(str)) if sort_by in CATEGORY_COLUMNS else None
+            if descending: df = df.iloc[::-1]
+            df = df.sort_values(sort_by, ascending=not descending, kind="stable", key=key)
+        elif descending: df = df.iloc[::-1]
+        return df.iloc[int(offset):int(offset) + int(limit)][columns or COLUMNS].reset_index(drop=True)
+
+    def count_matching(self, filters=None):
+        return len(self._filtered(filters))
+
+    # --- TICKET ID INDEX ---
+    # Built once from the card columns, then kept current by our own writes.
+    # A write from another process changes the file signature and forces a rebuild.
+    def _ticket_index(self):
+        with self._lock:
+            sig = self._signature()
+            if self._index is None or self._index_sig != sig:
+                self._index = TicketIndex(self.load_frame(CARD_COLUMNS).to_dict("records"))
+                self._index_sig = sig
+            return self._index
+
+    def _update_index(self, sig_before, apply):
+        if self._index is None: return
+        if self._index_sig != sig_before:
+            self._index = None
+            return
+        apply(self._index)
+        self._index_sig = self._signature()
+
+    def get_ticket(self, ticket_id, columns=CARD_COLUMNS):
+        if any(c not in CARD_COLUMNS for c in columns):
+            df = self.load_frame(columns)
+            match = df[df['ticket_id'] == ticket_id]
+            return match.iloc[0].to_dict() if not match.empty else None
+        card = self._ticket_index().get(ticket_id)
+        return {c: card[c] for c in columns} if card else None
+
+    def find_by_prefix(self, prefix, limit=10, columns=CARD_COLUMNS):
+        cards = self._ticket_index().find_by_prefix(prefix, limit)
+        return [{c: card[c] for c in columns if c in card} for card in cards]
+
+    # Appends and rewrites both move the file's mtime forward (0 once cleared);
+    # readers only compare it for equality
+    def version(self):
+        try: return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError: return 0
+
+    def clear(self):
+        with self._lock:
+            if os.path.exists(self.path): os.remove(self.path)
+            self._rewrites += 1
+            self._index = None
+            self._rows = None
+        self._notify({"kind": "clear"})
+
+    # --- FRAME CACHE HOOKS ---
+    def _signature(self):
+        try:
+            st_ = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st_.st_ino, st_.st_size, st_.st_mtime_ns)
+
+    # The cursor remembers the byte offset we have parsed up to plus the bytes
+    # just before it, so an in-place rewrite is not mistaken for an append.
+    def _cursor(self):
+        sig = self._signature()
+        if sig is None: return (None, 0, b"", self._rewrites)
+        size = sig[1]
+        with open(self.path, "rb") as f:
+            f.seek(max(0, size - TAIL_FINGERPRINT_BYTES))
+            return (sig[0], size, f.read(TAIL_FINGERPRINT_BYTES), self._rewrites)
+
+    def _is_append(self, old, new):
+        if old[0] is None or old[0] != new[0] or old[3] != new[3] or new[1] < old[1]: return False
+        with open(self.path, "rb") as f:
+            f.seek(max(0, old[1] - TAIL_FINGERPRINT_BYTES))
+            return f.read(len(old[2])) == old[2]
+
+    def _read_since(self, old, new, columns=COLUMNS):
+        with open(self.path, "rb") as f:
+            f.seek(old[1])
+            tail = f.read(new[1] - old[1])
+        if not tail.strip(): return pd.DataFrame(columns=columns)
+        return pd.read_csv(io.BytesIO(tail), header=None, names=COLUMNS, usecols=columns, dtype=str, keep_default_na=False)[columns]
+
+    def cached_frame(self, columns=None):
+        return _frame_cache_for(self, columns).get()
+
+
+# ==========================================
+# PROCESS-WIDE FRAME CACHE
+# ==========================================
+# Shared by every session in the process. A rerun with an unchanged file is a
+# stat() and nothing else; after a pure append only the new rows are parsed.
+# One cache per column set, holding a typed frame (see typed_frame).
+# Callers must treat the returned frame as read-only.
+
+class FrameCache:
+    def __init__(self, store, columns=COLUMNS):
+        self.store = store
+        self.columns = list(columns)
+        self.lock = threading.Lock()
+        self.frame = None
+        self.signature = None
+        self.cursor = None
+        self.stats = {"hits": 0, "misses": 0, "tail_reads": 0, "tail_rows": 0}
+
+    def get(self):
+        with self.lock:
+            sig = self.store._signature()
+            if self.frame is not None and sig == self.signature:
+                self.stats["hits"] += 1
+                return self.frame
+
+            cursor = self.store._cursor()
+            if self.frame is not None and self.store._is_append(self.cursor, cursor):
+                tail = self.store._read_since(self.cursor, cursor, self.columns)
+                if not tail.empty:
+                    self.frame = concat_typed(self.frame, typed_frame(tail))
+                self.stats["tail_reads"] += 1
+                self.stats["tail_rows"] += len(tail)
+            else:
+                self.frame = typed_frame(self.store.load_frame(self.columns))
+                self.stats["misses"] += 1
+            self.signature = sig
+            self.cursor = cursor
+            return self.frame
+
+_frame_cache_lock = threading.Lock()
+
+def _frame_cache_for(store, columns=None):
+    key = tuple(columns or COLUMNS)
+    caches = getattr(store, "_frame_caches", None)
+    if caches is None or key not in caches:
+        with _frame_cache_lock:
+            if getattr(store, "_frame_caches", None) is None: store._frame_caches = {}
+            if key not in store._frame_caches: store._frame_caches[key] = FrameCache(store, key)
+    return store._frame_caches[key]
+
+# Exported as frame_cache_<name> gauges (frame_bytes is left to the Performance
+# tab: deep memory_usage is too slow to run on every metrics export)
+FRAME_CACHE_COUNTERS = ["hits", "misses", "tail_reads", "tail_rows"]
+
+def frame_cache_counter(store, name):
+    return sum(cache.stats[name] for cache in list(getattr(store, "_frame_caches", {}).values()))
+
+def frame_cache_stats(store):
+    totals = {"hits": 0, "misses": 0, "tail_reads": 0, "tail_rows": 0, "frames": 0, "bytes": 0}
+    for cache in list(getattr(store, "_frame_caches", {}).values()):
+        for k, v in cache.stats.items(): totals[k] += v
+        if cache.frame is not None:
+            totals["frames"] += 1
+            totals["bytes"] += frame_bytes(cache.frame)
+    return totals
+
+
+# ==========================================
+# MEMORY REPORT
+# ==========================================
+# Old layout (every column as Python strings) against the typed frame and the
+# pruned per-view frames, measured on the store's current contents.
+
+def memory_report(store):
+    raw = store.load_frame()
+    rows = [{"frame": "all columns, strings (old)", "columns": len(raw.columns), "bytes": frame_bytes(raw)},
+            {"frame": "all columns, typed", "columns": len(raw.columns), "bytes": frame_bytes(typed_frame(raw))}]
+    for view, columns in VIEW_COLUMNS.items():
+        rows.append({"frame": f"{view} view, typed", "columns": len(columns), "bytes": frame_bytes(typed_frame(raw[columns]))})
+    baseline = rows[0]["bytes"] or 1
+    for row in rows:
+        row["rows"] = len(raw)
+        row["vs_old"] = row["bytes"] / baseline
+    return rows
+
+
+# ==========================================
+# MIGRATION (ticket_db.csv -> SQLite)
+# ==========================================
+
+def migrate_csv(csv_path, store):
+    if not os.path.exists(csv_path): return 0
+    imported = 0
+    for chunk in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=MIGRATE_CHUNK_ROWS):
+        imported += store.insert_many(chunk.to_dict("records"))
+    if hasattr(store, "set_meta"): store.set_meta("migrated_from", os.path.abspath(csv_path))
+    return imported
+
+
+# ==========================================
+# PROCESS-WIDE STORE
+# ==========================================
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = os.getenv("TICKET_STORE", "sqlite").lower()
+                if backend == "csv":
+                    _store = CsvTicketStore(os.getenv("TICKET_DB_PATH", LEGACY_CSV_PATH))
+                else:
+                    _store = SQLiteTicketStore(os.getenv("TICKET_DB_PATH", DEFAULT_DB_PATH))
+                    # One-shot import of the legacy file the first time the database is created
+                    if _store.get_meta("migrated_from") is None and _store.count() == 0:
+                        migrate_csv(LEGACY_CSV_PATH, _store)
+                metrics.set_gauge("ticket_store_rows", _store.row_count)
+                for name in FRAME_CACHE_COUNTERS:
+                    metrics.set_gauge(f"frame_cache_{name}", lambda name=name: frame_cache_counter(_store, name))
+    return _store
+
+
+if __name__ == "__main__":
+    # Usage: python ticket_store.py migrate [path/to/ticket_db.csv] [path/to/ticket_db.sqlite]
+    #        python ticket_store.py rebuild-rollup [path/to/ticket_db.sqlite]
+    #        python ticket_store.py memory-report [path/to/ticket_db.sqlite]
+    if len(sys.argv) >= 2 and sys.argv[1] == "memory-report":
+        db_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB_PATH
+        for row in memory_report(SQLiteTicketStore(db_path)):
+            print(f"{row['frame']:<30} {row['columns']:>3} cols  {row['bytes'] / 2**20:10.1f} MB  {row['vs_old']:6.1%} of old")
+        sys.exit(0)
+    if len(sys.argv) >= 2 and sys.argv[1] == "rebuild-rollup":
+        db_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB_PATH
+        SQLiteTicketStore(db_path).rebuild_rollup()
+        print(f"Rebuilt rollup counters in {db_path}")
+        sys.exit(0)
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python ticket_store.py migrate [csv_path] [db_path] | rebuild-rollup [db_path] | memory-report [db_path]")
+        sys.exit(1)
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else LEGACY_CSV_PATH
+    db_path = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DB_PATH
+    store = SQLiteTicketStore(db_path)
+    if store.get_meta("migrated_from"):
+        print(f"{db_path} was already migrated from {store.get_meta('migrated_from')}")
+        sys.exit(0)
+    count = migrate_csv(csv_path, store)
+    print(f"Imported {count} tickets from {csv_path} into {db_path}")
@@ -0,0 +1,82 @@
+import io
+import os
+import time
+import importlib
+import threading
+
+# ==========================================
+# VOICE NOTE TRANSCRIPTION (PLUGGABLE, LOCAL)
+# ==========================================
+# Turns an uploaded or recorded voice note into text for triage. Runs inside a
+# background job (jobs.py), so a slow model never blocks a Streamlit session.
+# A transcriber is any object with
+#
+#   transcribe(audio_bytes, on_progress=None) -> str
+#
+# where on_progress(fraction) may be called as audio is consumed.
+#
+# .env settings:
+#   TRANSCRIBER                    simulated (default), faster-whisper, or "package.module:ClassName"
+#   TRANSCRIBER_MODEL              faster-whisper model size or path (default base)
+#   TRANSCRIBER_WORKERS            parallel faster-whisper transcriptions (default 2)
+#   TRANSCRIBER_SIMULATED_SECONDS  how long the simulated transcriber "listens" (default 5)
+
+DEFAULT_TRANSCRIBER = "simulated"
+DEFAULT_MODEL = "base"
+DEFAULT_WORKERS = 2
+DEFAULT_SIMULATED_SECONDS = 5.0
+SIMULATED_TEXT = "My server room is overheating!"
+
+
+class SimulatedTranscriber:
+    # Demo stand-in: waits like a real model would, then returns a fixed report
+    def __init__(self, seconds=DEFAULT_SIMULATED_SECONDS, text=SIMULATED_TEXT):
+        self.seconds = seconds
+        self.text = text
+
+    def transcribe(self, audio, on_progress=None):
+        steps = 10
+        for step in range(steps):
+            time.sleep(self.seconds / steps)
+            if on_progress: on_progress((step + 1) / steps)
+        return self.text
+
+
+class FasterWhisperTranscriber:
+    def __init__(self, model=DEFAULT_MODEL, workers=DEFAULT_WORKERS):
+        # Imported here so the dependency is only needed when this transcriber is selected
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model, device="cpu", compute_type="int8", num_workers=workers)
+
+    def transcribe(self, audio, on_progress=None):
+        segments, info = self.model.transcribe(io.BytesIO(audio), vad_filter=True)
+        parts = []
+        for segment in segments:
+            parts.append(segment.text.strip())
+            if on_progress and info.duration: on_progress(min(1.0, segment.end / info.duration))
+        return " ".join(parts).strip()
+
+
+TRANSCRIBERS = {
+    "simulated": lambda: SimulatedTranscriber(float(os.getenv("TRANSCRIBER_SIMULATED_SECONDS", DEFAULT_SIMULATED_SECONDS))),
+    "faster-whisper": lambda: FasterWhisperTranscriber(os.getenv("TRANSCRIBER_MODEL", DEFAULT_MODEL),
+                                                       int(os.getenv("TRANSCRIBER_WORKERS", DEFAULT_WORKERS))),
+}
+
+def load_transcriber(spec):
+    if spec in TRANSCRIBERS: return TRANSCRIBERS[spec]()
+    if ":" not in spec: raise ValueError(f"Unknown TRANSCRIBER: {spec}")
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+_transcriber = None
+_transcriber_lock = threading.Lock()
+
+def get_transcriber():
+    global _transcriber
+    if _transcriber is None:
+        with _transcriber_lock:
+            if _transcriber is None:
+                _transcriber = load_transcriber(os.getenv("TRANSCRIBER", DEFAULT_TRANSCRIBER).strip())
+    return _transcriber
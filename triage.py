@@ -0,0 +1,232 @@
+import os
+import time
+import uuid
+import datetime
+import ticket_store
+import incident_view
+import rule_engine
+import triage_cache
+import duplicate_index
+import gemini_client
+import json_stream
+import triage_schema
+import router
+import metrics
+
+# ==========================================
+# TRIAGE PIPELINE (API + SIMULATION FALLBACK)
+# ==========================================
+# One message in, one triaged (and, if Open, saved) ticket out. Shared by the
+# chat UI in app.py and the headless ingestion workers in ingestion.py, so
+# both paths classify and persist tickets exactly the same way.
+#
+# Order of answers: an obvious duplicate of an open ticket, a cached model
+# triage, the local rules when they are confident (router.py), then the model.
+
+IMAGE_SIMULATION = {
+    "is_duplicate": False, "department": "Hardware", "urgency": "High",
+    "summary": "Visual Error Detected (OCR)",
+    "rca_hypothesis": "Image analysis detected 'Critical_Process_Died' error code.",
+    "response": "I have analyzed your screenshot. It appears to be a Critical System Failure (Blue Screen). I have alerted the Hardware Team immediately.",
+    "slack_draft": "🚨 IMAGE ALERT: BSOD detected.", "sentiment": "Panic", "status": "Open"
+}
+
+
+@metrics.timed("ticket_save")
+def save_ticket_to_csv(ticket_data, store=None):
+    for col in ticket_store.COLUMNS:
+        if col not in ticket_data:
+            ticket_data[col] = "N/A"
+
+    (store or ticket_store.get_store()).insert(ticket_data)
+
+@metrics.timed("incident_context")
+def get_active_incidents_context(store=None):
+    context_str = incident_view.HEALTHY_CONTEXT
+    try: context_str = incident_view.get_view(store or ticket_store.get_store()).context()
+    except: pass
+    return context_str
+
+def build_duplicate_triage(match, store=None):
+    parent = (store or ticket_store.get_store()).get_ticket(
+        match.parent_ticket_id, columns=["department", "urgency", "summary", "rca_hypothesis", "slack_draft", "sentiment"])
+    if parent is None: return None
+    return {
+        **parent, "is_duplicate": True, "status": "Open",
+        "response": f"This matches ongoing incident {match.parent_ticket_id}. I've linked your report so the team knows it affects you too."
+    }
+
+@metrics.timed("prompt_build")
+def build_prompt(user_input, active_context):
+    # === THE STRICT BRAIN (REAL API) ===
+    return f"""
+            You are NexusAgent, an elite IT Incident Commander.
+
+            ### INPUT ANALYSIS
+            User Input: "{user_input}"
+            Context: The user is an employee reporting an issue.
+
+            ### ONGOING INCIDENTS (already ticketed):
+            {active_context}
+            If the input describes one of these, set "is_duplicate": true.
+
+            ### STRICT URGENCY RULES (FOLLOW THESE):
+            1. **CRITICAL** (Red Alert):
+               - Safety hazards (Fire, Smoke, Sparks).
+               - Security breaches (Hacked, Ransomware).
+               - Total System Failure (Server Room down, ERP offline).
+            2. **HIGH** (Urgent):
+               - Hardware Failure preventing work (Laptop crash, Blue Screen, Broken Screen, Won't Turn On).
+               - Key software not opening (Zoom, Office, Login failed).
+            3. **MEDIUM** (Normal):
+               - WiFi slow, Printer jammed, VPN disconnecting.
+               - Single app glitching but usable.
+            4. **LOW** (Backlog):
+               - Password reset, Access request, "How do I..." questions.
+               - Feature requests or generic feedback.
+
+            ### SENTIMENT ANALYSIS:
+            - Detect if user is "Panic", "Angry", "Frustrated", or "Neutral".
+
+            ### OUTPUT FORMAT (JSON ONLY):
+            {{
+                "is_duplicate": false,
+                "department": "Hardware" | "Software" | "Network" | "Access" | "General",
+                "urgency": "Critical" | "High" | "Medium" | "Low",
+                "summary": "Short Technical Title (Max 6 words)",
+                "rca_hypothesis": "One sentence technical guess on root cause.",
+                "response": "Empathetic professional reply to the user (max 1 sentence).",
+                "slack_draft": "🚨 [URGENCY] [DEPT]: [Summary] - [RCA]",
+                "sentiment": "Neutral" | "Panic" | "Angry",
+                "status": "Open"
+            }}
+            """
+
+def simulate_triage(user_input, has_image=False):
+    # === THE SMART FALLBACK (SIMULATION) ===
+    # LOGIC: Image Detected
+    if has_image: return dict(IMAGE_SIMULATION)
+    # LOGIC: Keyword rules (shared with mock_brain)
+    return rule_engine.classify(user_input)
+
+@metrics.timed("parse")
+def parse_triage(text_response):
+    # Raises triage_schema.ReplyInvalid when the reply is beyond local repair
+    return triage_schema.parse_reply(text_response).to_dict()
+
+def stream_triage(model, contents, on_field):
+    # Fields are handed to on_field as soon as the incremental parser completes
+    # them; the full text is still returned for the final parse and the cache
+    parser = json_stream.IncrementalJSONParser()
+    chunks = []
+    started = time.perf_counter()
+    for chunk in model.generate_content(contents, stream=True, generation_config=triage_schema.GENERATION_CONFIG):
+        if not chunks: metrics.observe("model_first_chunk", time.perf_counter() - started)
+        chunks.append(chunk.text)
+        for key, value in parser.feed(chunk.text): on_field(key, value)
+    return "".join(chunks)
+
+def mint_ticket(data, user_input, channel, user_contact, has_image=False):
+    data["ticket_id"] = f"TKT-{str(uuid.uuid4())[:6].upper()}"
+    data["timestamp"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    data["channel"] = channel
+    data["user_contact"] = user_contact
+    data["raw_issue"] = user_input + (" [Image Attached]" if has_image else "")
+    return data
+
+
+class TriageResult:
+    def __init__(self, data, used_simulation, from_cache, duplicate, routed_locally=False):
+        self.data = data
+        self.used_simulation = used_simulation
+        self.from_cache = from_cache
+        self.duplicate = duplicate
+        self.routed_locally = routed_locally
+
+    @property
+    def is_ticket(self):
+        return self.data.get("status") == "Open"
+
+
+@metrics.timed("triage_total")
+def triage_message(user_input, api_key, channel, user_contact, image=None, attachment_digest=None, store=None, on_field=None):
+    # on_field(key, value) is called as each triage field becomes known: while
+    # the model is still streaming, or all at once for cached/simulated results
+    store = store or ticket_store.get_store()
+    shown = {}
+    def show(key, value):
+        shown[key] = value
+        on_field(key, value)
+    streaming = on_field is not None and os.getenv("GEMINI_STREAM", "1") != "0"
+    data = None
+    used_simulation = False
+    from_cache = False
+    routed_locally = False
+    duplicate_triage = None
+    metrics.inc("triage_requests_total")
+
+    # Near-duplicate of an open ticket? Obvious ones are linked without asking the model
+    duplicate = None
+    try:
+        with metrics.timed("duplicate_lookup"): duplicate = duplicate_index.get_index(store).find(user_input)
+    except: pass
+    if duplicate is not None and duplicate.is_obvious and image is None:
+        duplicate_triage = build_duplicate_triage(duplicate, store)
+
+    # Identical reports reuse an earlier model triage (fresh ticket_id/timestamp are still minted below)
+    cache = triage_cache.get_cache()
+    cache_key = cache.key_for(user_input, attachment_digest)
+    cached_triage = cache.get(cache_key) if api_key and duplicate_triage is None else None
+    route = router.route(user_input, image is not None)
+
+    try:
+        if duplicate_triage is not None:
+            metrics.inc("duplicates_auto_linked_total")
+            data = duplicate_triage
+
+        elif cached_triage is not None:
+            from_cache = True
+            metrics.inc("triage_cache_hits_total")
+            data = dict(cached_triage)
+
+        # Confident rule matches never reach the model
+        elif api_key and route.local:
+            routed_locally = True
+            metrics.inc("router_local_total")
+            data = route.result
+
+        # CHECK IF API KEY EXISTS IN ENV
+        elif api_key:
+            metrics.inc("router_escalated_total")
+            model = gemini_client.get_model(api_key)
+            prompt = build_prompt(user_input, get_active_incidents_context(store))
+            contents = [prompt, image] if image is not None else prompt
+            with metrics.timed("model_call"):
+                if streaming: text_response = stream_triage(model, contents, show)
+                else: text_response = model.generate_content(contents, generation_config=triage_schema.GENERATION_CONFIG).text
+            # Malformed replies are repaired locally; one beyond repair drops to the rules below
+            data = parse_triage(text_response)
+
+        else: raise Exception("No Key in .env")
+
+    except Exception as e:
+        used_simulation = True
+        metrics.inc("simulation_fallbacks_total")
+        # Unparseable replies and calls the breaker/limiter refused are counted where they happen
+        if api_key and not isinstance(e, (triage_schema.ReplyInvalid, gemini_client.ModelUnavailable)): metrics.inc("model_errors_total")
+        data = simulate_triage(user_input, image is not None)
+
+    if not used_simulation and not from_cache and not routed_locally and duplicate_triage is None: cache.put(cache_key, data)
+    if on_field is not None:
+        for key, value in data.items():
+            if key not in shown or shown[key] != value: show(key, value)
+
+    if data.get("status") == "Open":
+        if duplicate is not None:
+            data["is_duplicate"] = True
+            data["parent_ticket_id"] = duplicate.parent_ticket_id
+        mint_ticket(data, user_input, channel, user_contact, image is not None)
+        save_ticket_to_csv(data, store)
+        metrics.inc("tickets_created_total")
+
+    return TriageResult(data, used_simulation, from_cache, duplicate, routed_locally)
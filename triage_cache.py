@@ -0,0 +1,143 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# ==========================================
+# TRIAGE RESULT CACHE (MEMORY LRU + DISK)
+# ==========================================
+# Identical reports ("wifi is slow", "VPN keeps disconnecting") reuse the
+# model's earlier triage instead of paying for another round trip. Entries
+# are keyed by the normalized text plus the attachment's content hash. A hit
+# returns the triage fields only; app.py still mints a fresh ticket_id and
+# timestamp for every ticket.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, "triage_cache.sqlite")
+
+CACHE_TTL_SECONDS = 600
+CACHE_MAX_ENTRIES = 1000
+DISK_MAX_ENTRIES = 50000
+
+# Fields that belong to a single ticket and must never be replayed from cache
+TICKET_SPECIFIC_FIELDS = ["ticket_id", "timestamp", "channel", "user_contact", "raw_issue", "parent_ticket_id"]
+
+
+def normalize_input(text):
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+def attachment_hash(data):
+    return hashlib.sha256(data).hexdigest() if data else None
+
+
+class TriageCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        self._local = threading.local()
+        if path:
+            with self._conn() as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS triage_cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_triage_cache_expires ON triage_cache (expires_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def key_for(self, user_input, attachment_digest=None):
+        raw = normalize_input(user_input) + "|" + (attachment_digest or "")
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return json.loads(entry[1])
+                del self.memory[key]
+
+        if self.path:
+            try:
+                row = self._conn().execute(
+                    "SELECT value, expires_at FROM triage_cache WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row:
+                with self.lock:
+                    self._remember(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                return json.loads(row[0])
+
+        with self.lock: self.stats["misses"] += 1
+        return None
+
+    def put(self, key, data):
+        data = {k: v for k, v in data.items() if k not in TICKET_SPECIFIC_FIELDS}
+        value = json.dumps(data)
+        expires_at = time.time() + self.ttl
+        with self.lock:
+            self._remember(key, value, expires_at)
+            self.stats["writes"] += 1
+        if self.path:
+            try:
+                with self._conn() as conn:
+                    conn.execute("INSERT OR REPLACE INTO triage_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                                 (key, value, expires_at))
+                    if self.stats["writes"] % 100 == 0: self._prune(conn)
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, key, value, expires_at):
+        self.memory[key] = (expires_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _prune(self, conn):
+        conn.execute("DELETE FROM triage_cache WHERE expires_at <= ?", (time.time(),))
+        conn.execute("DELETE FROM triage_cache WHERE key IN (SELECT key FROM triage_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                     (DISK_MAX_ENTRIES,))
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        if self.path:
+            with self._conn() as conn: conn.execute("DELETE FROM triage_cache")
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
+
+    def summary(self):
+        return {**self.stats, "entries": len(self.memory), "hit_rate": round(self.hit_rate(), 3)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TriageCache(os.getenv("TRIAGE_CACHE_PATH", DEFAULT_CACHE_PATH),
+                                     max_entries=int(os.getenv("TRIAGE_CACHE_SIZE", CACHE_MAX_ENTRIES)),
+                                     ttl=float(os.getenv("TRIAGE_CACHE_TTL", CACHE_TTL_SECONDS)))
+    return _cache
@@ -0,0 +1,158 @@
+import re
+import json
+from dataclasses import dataclass, asdict
+import json_stream
+import metrics
+
+# ==========================================
+# TRIAGE REPLY SCHEMA (VALIDATION + LOCAL REPAIR)
+# ==========================================
+# The model is asked for JSON matching RESPONSE_SCHEMA (GENERATION_CONFIG is
+# passed with every triage call), and its reply is validated into a
+# TriageTicket. Replies that still come back malformed are repaired here
+# instead of being re-asked:
+#   - markdown fences, chatter before the opening brace, text after the object;
+#   - single-quoted strings and trailing commas;
+#   - a reply cut off mid-object (the completed fields are kept);
+#   - missing optional fields (filled from the dataclass defaults);
+#   - enum values in the wrong case.
+# Only a reply with no usable "urgency" or "response" is rejected
+# (ReplyInvalid), and triage.py then falls back to the local rules.
+#
+# Counters: triage_replies_valid_total, triage_replies_repaired_total,
+# triage_replies_failed_total.
+
+DEPARTMENTS = ["Hardware", "Software", "Network", "Access", "General"]
+URGENCIES = ["Critical", "High", "Medium", "Low"]
+SENTIMENTS = ["Neutral", "Panic", "Angry", "Frustrated"]
+REQUIRED_FIELDS = ["urgency", "response"]
+# (field, allowed values, fallback for an unknown value; None rejects the reply)
+ENUM_FIELDS = [("urgency", URGENCIES, None), ("department", DEPARTMENTS, "General"), ("sentiment", SENTIMENTS, "Neutral")]
+
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "is_duplicate": {"type": "boolean"},
+        "department": {"type": "string", "enum": DEPARTMENTS},
+        "urgency": {"type": "string", "enum": URGENCIES},
+        "summary": {"type": "string"},
+        "rca_hypothesis": {"type": "string"},
+        "response": {"type": "string"},
+        "slack_draft": {"type": "string"},
+        "sentiment": {"type": "string", "enum": SENTIMENTS},
+        "status": {"type": "string", "enum": ["Open"]},
+    },
+    "required": ["is_duplicate", "department", "urgency", "summary", "response", "sentiment", "status"],
+}
+GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": RESPONSE_SCHEMA}
+
+_decoder = json.JSONDecoder()
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+# Raised when a reply cannot be repaired into a ticket
+class ReplyInvalid(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class TriageTicket:
+    urgency: str
+    response: str
+    is_duplicate: bool = False
+    department: str = "General"
+    summary: str = "Reported Issue"
+    rca_hypothesis: str = "N/A"
+    slack_draft: str = "N/A"
+    sentiment: str = "Neutral"
+    status: str = "Open"
+
+    def to_dict(self):
+        return asdict(self)
+
+
+# --- DECODING ---
+def _requote(text):
+    # 'single' quoted strings become "double" quoted; text inside double quotes is left alone
+    out, quote, i = [], None, 0
+    while i < len(text):
+        ch = text[i]
+        if quote is None:
+            if ch in "\"'": quote = ch
+            out.append('"' if ch == "'" else ch)
+        elif ch == "\\" and i + 1 < len(text):
+            nxt = text[i + 1]
+            out.append("'" if quote == "'" and nxt == "'" else ch + nxt)
+            i += 1
+        elif ch == quote:
+            quote = None
+            out.append('"')
+        else:
+            out.append('\\"' if ch == '"' else ch)
+        i += 1
+    return "".join(out)
+
+def _raw_object(text):
+    start = text.find("{")
+    if start < 0: return None
+    try: value = _decoder.raw_decode(text, start)[0]
+    except ValueError: return None
+    return value if isinstance(value, dict) else None
+
+def decode_reply(text):
+    # Returns (object, repaired); raises ReplyInvalid when no object can be recovered
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict): return value, False
+    except ValueError:
+        pass
+    value = _raw_object(text)
+    if value is not None: return value, True
+    fixed = _TRAILING_COMMA.sub(r"\1", _requote(text))
+    value = _raw_object(fixed)
+    if value is not None: return value, True
+    # Cut off mid-reply: keep the fields that were completed
+    parser = json_stream.IncrementalJSONParser()
+    parser.feed(fixed)
+    if parser.fields: return dict(parser.fields), True
+    raise ReplyInvalid("no JSON object in reply")
+
+
+# --- VALIDATION ---
+def _choice(value, allowed):
+    folded = str(value).strip().lower()
+    return next((option for option in allowed if option.lower() == folded), None)
+
+def _flag(value):
+    if isinstance(value, str): return value.strip().lower() in ("true", "yes", "1")
+    return bool(value)
+
+def validate(data):
+    # Returns (TriageTicket, repaired)
+    repaired = False
+    values = {}
+    for name in TriageTicket.__slots__:
+        value = data.get(name)
+        if isinstance(value, str): value = value.strip()
+        if value is None or value == "":
+            if name in REQUIRED_FIELDS: raise ReplyInvalid(f"missing {name}")
+            repaired = True
+        else: values[name] = value if name == "is_duplicate" else str(value)
+    if "is_duplicate" in values: values["is_duplicate"] = _flag(values["is_duplicate"])
+    for name, allowed, fallback in ENUM_FIELDS:
+        if name not in values: continue
+        normal = _choice(values[name], allowed) or fallback
+        if normal is None: raise ReplyInvalid(f"unknown {name} {values[name]!r}")
+        repaired = repaired or normal != values[name]
+        values[name] = normal
+    return TriageTicket(**values), repaired
+
+def parse_reply(text):
+    try:
+        data, repaired = decode_reply(text)
+        ticket, fixed = validate(data)
+    except ReplyInvalid:
+        metrics.inc("triage_replies_failed_total")
+        raise
+    metrics.inc("triage_replies_repaired_total" if repaired or fixed else "triage_replies_valid_total")
+    return ticket